@@ -0,0 +1,184 @@
+# End-to-end dashboard benchmark on a synthetic data folder
+#
+#   python -m benchmarks.bench_dashboard --months 24 --items 400 --out results.json
+#   python -m benchmarks.bench_dashboard --months 24 --items 400 --compare results.json
+#
+# Records the cold snapshot build (from xlsx, then from Arrow snapshots), the
+# inventory analysis on its own, warm per-route latency and peak RSS. Each
+# measurement runs in a fresh interpreter so earlier caches don't leak in.
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_dataset
+
+ROUTES = [
+    "/",
+    "/charts",
+    "/tables",
+    "/?last=3",
+    "/api/v1/revenue",
+    "/api/v1/items",
+    "/api/v1/inventory",
+    "/api/v1/alerts",
+    "/api/v1/forecast/demand",
+    "/api/v1/tables/items?draw=1&start=0&length=25&columns[0][data]=Amount&order[0][column]=0&order[0][dir]=desc",
+]
+
+def summarize(samples):
+    """min/mean/p50/p95/max of a list of seconds, in milliseconds."""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+    return {
+        "min_ms": ordered[0] * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(0.5),
+        "p95_ms": pick(0.95),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def measure(data_dir, requests, routes):
+    """Runs inside the child interpreter and returns its measurements."""
+    import logging
+    os.environ["MSY_SNAPSHOT_REFRESH"] = "0"
+    os.environ["MSY_DATA_DIR"] = data_dir
+    logging.getLogger("website").setLevel(logging.WARNING)
+
+    from website import create_app
+    from website.analysis import get_dashboard_snapshot, get_inventory_analysis
+
+    start = time.perf_counter()
+    snapshot = get_dashboard_snapshot(data_dir)
+    cold_build = time.perf_counter() - start
+
+    frames = snapshot['frames']
+    n_months = frames['item_df']['Month'].nunique()
+    inventory = []
+    for _ in range(max(requests // 10, 3)):
+        start = time.perf_counter()
+        get_inventory_analysis(data_dir, frames['item_df'], n_months)
+        inventory.append(time.perf_counter() - start)
+
+    app = create_app()
+    logging.getLogger("website").setLevel(logging.WARNING)
+    client = app.test_client()
+
+    route_results = {}
+    for route in routes:
+        response = client.get(route)  # warm-up: builds this route's cached payloads
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(route)
+            samples.append(time.perf_counter() - start)
+        route_results[route] = {"status": response.status_code, "bytes": len(response.data), **summarize(samples)}
+
+    return {
+        "cold_build_seconds": cold_build,
+        "inventory_analysis": summarize(inventory),
+        "routes": route_results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_child(data_dir, requests, routes):
+    """Runs measure() in a fresh interpreter and returns its JSON result."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_dashboard", "--measure", data_dir,
+         "--requests", str(requests), "--routes", *routes],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, baseline):
+    """Prints current vs baseline for the headline numbers (ratio > 1 is slower)."""
+    rows = [("cold build (xlsx) s", current["cold"]["cold_build_seconds"], baseline["cold"]["cold_build_seconds"]),
+            ("cold build (arrow) s", current["warm_files"]["cold_build_seconds"], baseline["warm_files"]["cold_build_seconds"]),
+            ("inventory p50 ms", current["warm_files"]["inventory_analysis"]["p50_ms"], baseline["warm_files"]["inventory_analysis"]["p50_ms"]),
+            ("peak RSS MB", current["warm_files"]["peak_rss_mb"], baseline["warm_files"]["peak_rss_mb"])]
+    for route, result in current["warm_files"]["routes"].items():
+        previous = baseline["warm_files"]["routes"].get(route)
+        if previous is not None:
+            rows.append((f"{route[:40]} p50 ms", result["p50_ms"], previous["p50_ms"]))
+    print(f"{'metric':<48} {'current':>10} {'baseline':>10} {'ratio':>7}")
+    for name, now, before in rows:
+        print(f"{name:<48} {now:10.3f} {before:10.3f} {now / before if before else float('nan'):7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard builds and routes on synthetic data")
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--items', type=int, default=400)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--groups', type=int, default=4)
+    parser.add_argument('--ingredients', type=int, default=18)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50, help="timed requests per route")
+    parser.add_argument('--routes', nargs='+', default=ROUTES)
+    parser.add_argument('--data-dir', help="benchmark an existing data folder instead of generating one")
+    parser.add_argument('--out', help="write the results JSON here")
+    parser.add_argument('--compare', help="results JSON from an earlier run to compare against")
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.requests, args.routes)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.data_dir:
+            data_dir, dataset = os.path.abspath(args.data_dir), {"data_dir": os.path.abspath(args.data_dir)}
+        else:
+            data_dir = tmp_dir
+            dataset = generate_dataset(data_dir, months=args.months, items=args.items, categories=args.categories,
+                                       groups=args.groups, ingredients=args.ingredients, seed=args.seed)
+            dataset.pop("month_files")
+
+        # First run parses the workbooks (and writes Arrow snapshots), the second starts from them
+        results = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": dataset,
+            "cold": run_child(data_dir, args.requests, args.routes),
+            "warm_files": run_child(data_dir, args.requests, args.routes),
+        }
+
+    print(f"cold build: {results['cold']['cold_build_seconds']:.3f}s from xlsx, "
+          f"{results['warm_files']['cold_build_seconds']:.3f}s from snapshots; "
+          f"peak RSS {results['warm_files']['peak_rss_mb']:.1f} MB")
+    for route, result in results["warm_files"]["routes"].items():
+        print(f"  {route[:60]:<60} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
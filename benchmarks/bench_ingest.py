@@ -0,0 +1,105 @@
+# Cold-build wall time of ingest_months() versus worker count
+#
+#   python -m benchmarks.bench_ingest --months 36 --workers 1 2 4 8
+#
+# Every timed run starts without Arrow snapshots (.snapshots/ is cleared), so
+# it parses the workbooks like a first build would, snapshot writes included.
+# A separate "snapshot" row times the same ingest read back from snapshots.
+#
+# Before timing, the running totals of aggregates.AggregateStore are checked
+# against a full groupby recompute of the same months (within a tolerance).
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from website.aggregates import AggregateStore
+from website.analysis import ingest_months
+from website.snapshots import SNAPSHOT_DIR_NAME
+from benchmarks.synthetic import generate_months
+
+RTOL = 1e-9
+
+def clear_snapshots(data_dir):
+    """Removes the Arrow snapshots, so the next ingest parses every workbook."""
+    shutil.rmtree(os.path.join(data_dir, SNAPSHOT_DIR_NAME), ignore_errors=True)
+
+def time_ingest(month_files, data_dir, mode, workers, repeat, cold=True):
+    """
+    Returns the best wall time (seconds) over `repeat` ingests: cold ones
+    (snapshots cleared first) or, with cold=False, ones served from the
+    snapshots the previous run left behind.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if cold:
+            clear_snapshots(data_dir)
+        start = time.perf_counter()
+        # cache=False: every month is loaded again instead of reused from memory
+        ingest_months(month_files, data_dir, mode=mode, max_workers=workers, cache=False)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def recompute_totals(loaded):
+    """Item and category totals the way the dashboard computed them before AggregateStore."""
+    items = pd.concat([sheets['items'].assign(Month=month) for month, sheets in loaded.items()], ignore_index=True)
+    item_totals = items.groupby('Item Name')[['Amount', 'Count']].sum()
+    item_totals['Months_Data'] = items.groupby('Item Name')['Month'].nunique()
+    warehouse = pd.concat([sheets['warehouse'] for sheets in loaded.values()], ignore_index=True)
+    return item_totals, warehouse.groupby('Category')[['Amount']].sum()
+
+def assert_totals_match(store, loaded):
+    """Raises AssertionError if the store's totals differ from a full recompute beyond RTOL."""
+    item_totals, category_totals = recompute_totals(loaded)
+    for name, actual, expected in (("items", store.item_totals, item_totals),
+                                   ("categories", store.category_totals, category_totals)):
+        actual = actual.sort_index()[expected.columns]
+        assert actual.index.equals(expected.sort_index().index), f"{name}: keys differ from a full recompute"
+        assert np.allclose(actual.to_numpy(dtype=float), expected.sort_index().to_numpy(dtype=float),
+                           rtol=RTOL, atol=0), f"{name}: totals differ from a full recompute"
+
+def check_aggregates(month_files, data_dir):
+    """Merges every month, then removes the last one, comparing against a recompute each time."""
+    loaded = ingest_months(month_files, data_dir, mode='serial', cache=False)
+    store = AggregateStore()
+    store.sync(loaded, {month: month for month in loaded})
+    assert_totals_match(store, loaded)
+
+    remaining = dict(list(loaded.items())[:-1])
+    store.sync(remaining, {month: month for month in remaining})
+    assert_totals_match(store, remaining)
+    print(f"aggregates match a full recompute (rtol={RTOL:g}), including after removing a month")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold month ingestion by worker count")
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--items', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        month_files = generate_months(data_dir, months=args.months, items=args.items)
+        print(f"{args.months} months x {args.items} items, best of {args.repeat}")
+        check_aggregates(month_files, data_dir)
+
+        serial = time_ingest(month_files, data_dir, 'serial', 1, args.repeat)
+        print(f"{'serial':>8} {'-':>7} {serial:8.3f}s  1.00x")
+        for mode in ('process', 'thread'):
+            for workers in args.workers:
+                elapsed = time_ingest(month_files, data_dir, mode, workers, args.repeat)
+                print(f"{mode:>8} {workers:>7} {elapsed:8.3f}s  {serial / elapsed:.2f}x")
+
+        # Snapshot-warm: the last cold run left fresh snapshots behind
+        warm = time_ingest(month_files, data_dir, 'serial', 1, args.repeat, cold=False)
+        print(f"{'snapshot':>8} {'-':>7} {warm:8.3f}s  {serial / warm:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Synthetic Data_Matrix workbooks and recipe/shipment CSVs for benchmarking
+#
+# generate_dataset() writes a complete data folder that the dashboard can load:
+# monthly workbooks in the POS export layout ('data 1' group totals, 'data 2'
+# category totals, 'data 3' item sales, with '$1,234.56' / '1,234' strings),
+# "MSY Data - Ingredient.csv", "MSY Data - Shipment.csv" and a bom_rules.json
+# that maps every shipment to its ingredient.
+import json
+import os
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December"]
+
+INGREDIENT_FILE = "MSY Data - Ingredient.csv"
+SHIPMENT_FILE = "MSY Data - Shipment.csv"
+RULES_FILE = "bom_rules.json"
+
+# Ingredient units as they appear in Ingredient.csv headers, and how each is shipped
+INGREDIENT_UNITS = ("g", "g", "g", "count", "pcs")
+SHIPMENT_UNITS = {"g": ("lbs", 453.592), "count": ("pieces", 1), "pcs": ("pieces", 1)}
+SHIPMENTS_PER_MONTH = {"weekly": 4, "biweekly": 2, "monthly": 1}
+
+def format_amount(values):
+    """Formats numbers the way the POS export does, e.g. '$1,234.56'."""
+    return [f"${v:,.2f}" for v in values]
+
+def format_count(values):
+    """Formats counts the way the POS export does, e.g. '1,234'."""
+    return [f"{v:,}" for v in values]
+
+def make_sheet(label_column, labels, counts, amounts):
+    """Builds one 'data N' sheet with string-formatted Count/Amount columns."""
+    return pd.DataFrame({
+        'source_page': 1,
+        'source_table': 1,
+        label_column: labels,
+        'Count': format_count(counts),
+        'Amount': format_amount(amounts),
+    })
+
+def make_catalog(rng, items=120, categories=20, groups=4):
+    """
+    Menu items with a category, a menu group, a price and a popularity
+    (long-tailed, so a few items sell most of the units).
+    """
+    return pd.DataFrame({
+        'Item Name': [f"Item {i}" for i in range(items)],
+        'Category': [f"Category {i}" for i in rng.integers(0, categories, size=items)],
+        'Group': [f"Group {i}" for i in rng.integers(0, groups, size=items)],
+        'Price': np.round(rng.uniform(3, 25, size=items), 2),
+        'Popularity': rng.pareto(1.5, size=items) * 200 + 5,
+    })
+
+def month_sales(rng, catalog, month_index):
+    """
+    Units sold per catalog item in one month: popularity with a mild yearly
+    season, a slow trend and noise. About 5% of items sell nothing.
+    """
+    season = 1 + 0.15 * np.sin(2 * np.pi * (month_index % 12) / 12)
+    trend = 1 + 0.01 * month_index
+    expected = catalog['Popularity'].to_numpy() * season * trend
+    counts = rng.poisson(expected)
+    counts[rng.random(len(counts)) < 0.05] = 0
+    return counts
+
+def write_month_workbook(path, catalog, counts):
+    """Writes one Data_Matrix workbook whose group/category sheets add up to its item sheet."""
+    sales = catalog.assign(Count=counts, Amount=counts * catalog['Price'])
+    sold = sales[sales['Count'] > 0]
+    by_group = sold.groupby('Group')[['Count', 'Amount']].sum().reset_index()
+    # Categories without sales still appear with 0 / $0.00, as in the real exports
+    by_category = sales.groupby('Category')[['Count', 'Amount']].sum().reset_index()
+    with pd.ExcelWriter(path) as writer:
+        make_sheet('Group', by_group['Group'], by_group['Count'], by_group['Amount']).to_excel(writer, sheet_name='data 1', index=False)
+        make_sheet('Category', by_category['Category'], by_category['Count'], by_category['Amount']).to_excel(writer, sheet_name='data 2', index=False)
+        make_sheet('Item Name', sold['Item Name'], sold['Count'], sold['Amount']).to_excel(writer, sheet_name='data 3', index=False)
+
+def write_months(out_dir, rng, catalog, months, start_year):
+    """Writes `months` workbooks from January of start_year; returns {label: file name} and the sales matrix."""
+    month_files = {}
+    sales = np.zeros((months, len(catalog)), dtype=int)
+    for i in range(months):
+        year = start_year + i // 12
+        month_name = MONTH_NAMES[i % 12]
+        file_name = f"{month_name}_{year}_Data_Matrix.xlsx"
+        sales[i] = month_sales(rng, catalog, i)
+        write_month_workbook(os.path.join(out_dir, file_name), catalog, sales[i])
+        month_files[f"{month_name} {year}"] = file_name
+    return month_files, sales
+
+def make_recipes(rng, catalog, ingredients=18, per_item=(2, 6)):
+    """Item x ingredient quantities (mostly empty) with a unit per ingredient."""
+    names = [f"Ingredient {j}" for j in range(ingredients)]
+    units = [INGREDIENT_UNITS[j % len(INGREDIENT_UNITS)] for j in range(ingredients)]
+    recipes = np.zeros((len(catalog), ingredients))
+    for i in range(len(catalog)):
+        n = rng.integers(per_item[0], min(per_item[1], ingredients) + 1)
+        for j in rng.choice(ingredients, size=n, replace=False):
+            recipes[i, j] = rng.integers(20, 200) if units[j] == 'g' else rng.integers(1, 3)
+    return names, units, recipes
+
+def write_recipes(out_dir, catalog, names, units, recipes):
+    """Writes Ingredient.csv with 'Name (unit)' headers and blank cells for unused ingredients."""
+    headers = [name if unit == 'g' else f"{name} ({unit})" for name, unit in zip(names, units)]
+    recipe_df = pd.DataFrame(np.where(recipes > 0, recipes, np.nan), columns=headers)
+    recipe_df.insert(0, 'Item name', catalog['Item Name'])
+    recipe_df.to_csv(os.path.join(out_dir, INGREDIENT_FILE), index=False)
+
+def write_shipments(out_dir, rng, names, units, monthly_usage):
+    """
+    Writes Shipment.csv and bom_rules.json. Each ingredient gets a shipment
+    schedule supplying 0.9x-2.2x its average monthly usage, so the dashboard
+    shows a mix of low, stocked and surplus items.
+    """
+    rows = []
+    rules = {"unit_conversions": {unit: factor for unit, factor in SHIPMENT_UNITS.values()}, "shipments": []}
+    frequencies = list(SHIPMENTS_PER_MONTH)
+    for name, unit, usage in zip(names, units, monthly_usage):
+        ship_unit, factor = SHIPMENT_UNITS[unit]
+        frequency = frequencies[rng.integers(0, len(frequencies))]
+        number = int(rng.integers(1, 4))
+        supply = max(usage, 1) * rng.uniform(0.9, 2.2) / factor
+        quantity = max(int(round(supply / (number * SHIPMENTS_PER_MONTH[frequency]))), 1)
+        rows.append({'Ingredient': name, 'Quantity per shipment': quantity, 'Unit of shipment': ship_unit,
+                     'Number of shipments': number, 'frequency': frequency})
+        rules["shipments"].append({"shipment": name, "ingredients": {name: 1}})
+    pd.DataFrame(rows).to_csv(os.path.join(out_dir, SHIPMENT_FILE), index=False)
+    with open(os.path.join(out_dir, RULES_FILE), "w") as f:
+        json.dump(rules, f, indent=2)
+
+def generate_months(out_dir, months=24, items=120, categories=20, groups=4, start_year=2023, seed=0):
+    """
+    Writes `months` Data_Matrix workbooks into out_dir and returns the
+    {month label: file name} mapping in chronological order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    catalog = make_catalog(rng, items, categories, groups)
+    month_files, _ = write_months(out_dir, rng, catalog, months, start_year)
+    return month_files
+
+def generate_dataset(out_dir, months=6, items=120, categories=20, groups=4, ingredients=18,
+                     start_year=2023, seed=0):
+    """
+    Writes a complete data folder (workbooks, Ingredient/Shipment CSVs and
+    bom_rules.json) into out_dir and returns a summary of what was written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    catalog = make_catalog(rng, items, categories, groups)
+    month_files, sales = write_months(out_dir, rng, catalog, months, start_year)
+
+    names, units, recipes = make_recipes(rng, catalog, ingredients)
+    write_recipes(out_dir, catalog, names, units, recipes)
+    write_shipments(out_dir, rng, names, units, sales.mean(axis=0) @ recipes)
+
+    return {
+        "months": months,
+        "items": items,
+        "categories": categories,
+        "groups": groups,
+        "ingredients": ingredients,
+        "item_rows": int((sales > 0).sum()),
+        "month_files": month_files,
+    }
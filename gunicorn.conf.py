@@ -0,0 +1,35 @@
+# Production serving: gunicorn -c gunicorn.conf.py main:app
+#
+# The arbiter publishes the dashboard snapshot once before any worker starts
+# and then leaves rebuilding to a single builder process (python -m
+# website.shared --watch). Workers run with MSY_SNAPSHOT_SHARED=1 and
+# memory-map the published snapshot instead of parsing the workbooks
+# themselves, so adding workers doesn't add copies of the data.
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get("MSY_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("MSY_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.environ.get("MSY_THREADS", "4"))
+timeout = 60
+
+# Inherited by every worker
+os.environ["MSY_SNAPSHOT_SHARED"] = "1"
+
+def run_builder(*args):
+    return [sys.executable, "-m", "website.shared", *args]
+
+def on_starting(server):
+    # Publish in a child process so the arbiter itself never holds the frames
+    subprocess.run(run_builder(), cwd=ROOT, check=False)
+    server.msy_builder = subprocess.Popen(run_builder("--watch"), cwd=ROOT)
+
+def on_exit(server):
+    builder = getattr(server, "msy_builder", None)
+    if builder is not None:
+        builder.terminate()
+        builder.wait(timeout=10)
@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bootstrap import Bootstrap
@@ -12,13 +13,51 @@ def create_app():
     bootstrap = Bootstrap(app)
     app.config["SECRET_KEY"] = "RAJ THE KELLYANTE KING"
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_NAME}"
+    # Analytical tables (models.py) live in their own database beside the data snapshots
+    from .analysis import get_default_data_dir, get_location_dir
+    from .sqlstore import get_analytics_db_path
+    analytics_db = get_analytics_db_path(get_location_dir(), get_default_data_dir())
+    app.config["SQLALCHEMY_BINDS"] = {"analytics": f"sqlite:///{analytics_db}"}
+    app.config["SNAPSHOT_SHARED"] = os.environ.get("MSY_SNAPSHOT_SHARED", "0") == "1"
+    app.config["SNAPSHOT_REFRESH"] = os.environ.get("MSY_SNAPSHOT_REFRESH", "1") != "0"
+    app.config["SNAPSHOT_REFRESH_INTERVAL"] = float(os.environ.get("MSY_SNAPSHOT_REFRESH_INTERVAL", "5"))
+    app.config["FORECAST_MODEL"] = os.environ.get("MSY_FORECAST_MODEL", "linear")
+    app.config["FORECAST_INTERVAL"] = float(os.environ.get("MSY_FORECAST_INTERVAL", "0.8"))
+    app.config["LOG_LEVEL"] = os.environ.get("MSY_LOG_LEVEL", "INFO")
+    app.config["LOG_FORMAT"] = os.environ.get("MSY_LOG_FORMAT", "text")
     db.init_app(app)
 
+    # Structured logs and request/render timings for /metrics
+    from . import metrics
+    metrics.configure_logging(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
+    metrics.init_app(app)
+
     # Register Roots/Blueprints
     from .views import views
     from .auth import auth
+    from .api import api
 
     app.register_blueprint(views, url_prefix="/")
     app.register_blueprint(auth, url_prefix="/")
+    app.register_blueprint(api, url_prefix="/api/v1")
+
+    # Multi-worker serving: read the snapshot a builder process publishes (see shared.py).
+    # Background refresh and publishing cover the default location; other stores
+    # are built on demand and evicted under MSY_SNAPSHOT_CACHE_MB.
+    if app.config["SNAPSHOT_SHARED"]:
+        from .analysis import set_shared_reader
+        from .shared import SharedSnapshotReader
+
+        reader = SharedSnapshotReader(get_location_dir())
+        set_shared_reader(reader.data_dir, reader)
+        app.extensions["snapshot_refresher"] = reader
+
+    # Rebuild the dashboard snapshot in the background when data/ changes
+    elif app.config["SNAPSHOT_REFRESH"]:
+        from .refresher import start_refresher
+
+        app.extensions["snapshot_refresher"] = start_refresher(
+            get_location_dir(), app.config["SNAPSHOT_REFRESH_INTERVAL"]
+        )
 
     return app
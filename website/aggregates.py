@@ -0,0 +1,176 @@
+# Incremental month-over-month aggregation
+#
+# Each month workbook is reduced once to small partial aggregates (per-item
+# amount/count, per-category revenue, month revenue). Those partials are saved
+# with the month's snapshot and merged into running totals, so adding or
+# correcting a month only re-aggregates that month's partial. (The snapshot
+# build still concatenates the per-month rows for the month cubes.)
+import threading
+
+import pandas as pd
+
+from .schema import frame_bytes
+
+PARTIAL_ROLES = ('item_totals', 'category_totals')
+
+_store_lock = threading.Lock()
+_aggregate_stores = {}
+
+def compute_month_partials(sheets):
+    """
+    Reduces one month's cleaned sheets to its partial aggregates:
+    'item_totals' (Item Name, Amount, Count) and 'category_totals'
+    (Category, Amount).
+    """
+    partials = {}
+    if 'items' in sheets:
+        partials['item_totals'] = sheets['items'].groupby('Item Name')[['Amount', 'Count']].sum().reset_index()
+    if 'warehouse' in sheets:
+        partials['category_totals'] = sheets['warehouse'].groupby('Category')[['Amount']].sum().reset_index()
+    return partials
+
+def get_month_partials(sheets):
+    """Partials stored alongside the sheets, computing any that are missing."""
+    partials = {role: sheets[role] for role in PARTIAL_ROLES if role in sheets}
+    if len(partials) < len(PARTIAL_ROLES):
+        partials = {**compute_month_partials(sheets), **partials}
+    return partials
+
+def add_totals(totals, compensation, partial, sign):
+    """
+    Adds (sign=1) or subtracts (sign=-1) a partial from running totals.
+    Float columns use Kahan summation, so merged totals agree with a full
+    groupby().sum() recompute to within floating-point rounding (not bit
+    for bit: the order of additions differs). Returns the new (totals,
+    compensation).
+    """
+    if totals is None:
+        if sign < 0:
+            return None, None
+        return partial.copy(), pd.DataFrame(0.0, index=partial.index, columns=partial.columns)
+
+    index = totals.index.union(partial.index)
+    totals = totals.reindex(index, fill_value=0)
+    compensation = compensation.reindex(index, fill_value=0.0)
+    aligned = partial.reindex(index, fill_value=0)
+    for col in partial.columns:
+        if totals[col].dtype != aligned[col].dtype:
+            totals[col] = totals[col].astype(float)
+            aligned[col] = aligned[col].astype(float)
+        if totals[col].dtype.kind == 'f':
+            y = sign * aligned[col] - compensation[col]
+            t = totals[col] + y
+            compensation[col] = (t - totals[col]) - y
+            totals[col] = t
+        else:
+            totals[col] = totals[col] + sign * aligned[col]
+    return totals, compensation
+
+class AggregateStore:
+    """
+    Running totals over every ingested month. update() replaces one month's
+    partial (subtracting the old one first), so the cost is proportional to
+    that month rather than to the full history.
+    """
+
+    def __init__(self):
+        self.months = {}           # month -> (source key, partials, revenue)
+        self.item_totals = None    # index Item Name -> Amount, Count, Months_Data
+        self.category_totals = None  # index Category -> Amount
+        self._item_compensation = None
+        self._category_compensation = None
+
+    def _apply(self, partials, sign):
+        item_partial = partials.get('item_totals')
+        if item_partial is not None:
+            item_partial = item_partial.set_index('Item Name').assign(Months_Data=1)
+            self.item_totals, self._item_compensation = add_totals(
+                self.item_totals, self._item_compensation, item_partial, sign)
+            if self.item_totals is not None:
+                # Drop items whose last month was removed
+                keep = self.item_totals['Months_Data'] > 0
+                self.item_totals = self.item_totals[keep]
+                self._item_compensation = self._item_compensation[keep]
+        category_partial = partials.get('category_totals')
+        if category_partial is not None:
+            category_partial = category_partial.set_index('Category')
+            self.category_totals, self._category_compensation = add_totals(
+                self.category_totals, self._category_compensation, category_partial, sign)
+
+    def nbytes(self):
+        """Bytes held by the stored month partials and the running totals."""
+        frames = [frame for _, partials, _ in self.months.values() for frame in partials.values()]
+        frames += [self.item_totals, self.category_totals, self._item_compensation, self._category_compensation]
+        return sum(frame_bytes(frame) for frame in frames if frame is not None)
+
+    def update(self, month, key, sheets):
+        """Ingests (or re-ingests) one month. A no-op if key is unchanged."""
+        current = self.months.get(month)
+        if current is not None and current[0] == key:
+            return False
+        if current is not None:
+            self._apply(current[1], -1)
+
+        partials = get_month_partials(sheets)
+        revenue = sheets['revenue']['Amount'].sum() if 'revenue' in sheets else None
+        self._apply(partials, 1)
+        self.months[month] = (key, partials, revenue)
+        return True
+
+    def remove(self, month):
+        """Forgets a month whose file disappeared."""
+        current = self.months.pop(month, None)
+        if current is not None:
+            self._apply(current[1], -1)
+
+    def sync(self, month_sheets, month_keys):
+        """
+        Brings the store in line with the loaded months: {month: sheets} plus
+        {month: source key}. Returns the months that were (re)ingested.
+        """
+        for month in [m for m in self.months if m not in month_sheets]:
+            self.remove(month)
+        return [month for month, sheets in month_sheets.items()
+                if self.update(month, month_keys[month], sheets)]
+
+    def monthly_revenue(self, month_order):
+        """[{'Month', 'Total_Revenue'}] for months that had a revenue sheet."""
+        return [{"Month": month, "Total_Revenue": self.months[month][2]}
+                for month in month_order
+                if month in self.months and self.months[month][2] is not None]
+
+    def item_sales(self):
+        """Total units per item (sorted by name)."""
+        return self.item_totals['Count'].sort_index()
+
+    def top_items(self):
+        """Items by total revenue: Item Name, Amount, Count, Months_Data, Avg_Price."""
+        top_items = self.item_totals.sort_index().rename_axis('Item Name').reset_index()
+        top_items = top_items[['Item Name', 'Amount', 'Count', 'Months_Data']]
+        top_items = top_items.sort_values(by='Amount', ascending=False).reset_index(drop=True)
+        top_items['Months_Data'] = top_items['Months_Data'].astype('int64')
+        top_items['Avg_Price'] = top_items['Amount'] / top_items['Count']
+        return top_items
+
+    def category_revenue(self):
+        """Total revenue per warehouse category (sorted by name)."""
+        return self.category_totals['Amount'].sort_index()
+
+def get_aggregate_store(data_dir):
+    """The AggregateStore kept for data_dir (created on first use)."""
+    with _store_lock:
+        store = _aggregate_stores.get(data_dir)
+        if store is None:
+            store = _aggregate_stores[data_dir] = AggregateStore()
+        return store
+
+def aggregate_store_bytes(data_dir):
+    """AggregateStore.nbytes() of data_dir's running totals (0 if it has none)."""
+    with _store_lock:
+        store = _aggregate_stores.get(data_dir)
+    return store.nbytes() if store is not None else 0
+
+def drop_aggregate_store(data_dir):
+    """Forgets data_dir's running totals (e.g. when its snapshot is evicted)."""
+    with _store_lock:
+        _aggregate_stores.pop(data_dir, None)
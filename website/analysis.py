@@ -1,185 +1,329 @@
 import pandas as pd
-import re
 import os
 import altair as alt
 import numpy as np
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .snapshots import get_file_key, load_with_snapshot, read_csv_snapshot
+from .discovery import build_month_index
+from .recipes import BOM_RULES_FILE, load_bill_of_materials
+from .aggregates import aggregate_store_bytes, compute_month_partials, drop_aggregate_store, get_aggregate_store
+from .cubes import build_month_cubes, resolve_window
+from .forecasting import drop_forecasts, forecast_bytes
+from .sqlstore import get_analytics_store, recipe_rows, shipment_rows
+from .streaming import should_stream, stream_month_workbook
+from .schema import compact_frame, frame_bytes, memory_report
+from .projection import STOCK_RULES, classify_stock, project_shipments
+from .locations import list_locations, resolve_location, summarize_snapshot
+from .metrics import (FILES_PARSED, FRAME_BYTES, ROWS_PROCESSED, SNAPSHOT_BUILD_SECONDS, SNAPSHOT_EVICTIONS, log_event,
+                      record_cache, stage_timer)
 from datetime import datetime
 
+log = logging.getLogger(__name__)
+
+# --- Dashboard Cache ---
+# Built dashboard bundles are kept per data directory (one per store location)
+# and reused until the set of source files (or their mtimes/sizes) changes.
+# The least recently used stores are evicted once everything held for the
+# resident stores (snapshot frames, parsed months, running aggregates, window
+# snapshots and forecasts) outgrows MSY_SNAPSHOT_CACHE_MB; their small
+# chain-rollup summaries are kept.
+_cache_lock = threading.Lock()
+_build_lock = threading.Lock()
+_dashboard_cache = OrderedDict()
+_location_summaries = {}
+_background_refresh_dirs = set()
+_shared_readers = {}
+_month_cache = {}
+_window_cache = OrderedDict()
+_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'rebuilds': 0,
+    'evictions': 0,
+    'last_rebuild_seconds': 0.0,
+    'total_rebuild_seconds': 0.0,
+}
+
+DATA_FILE_EXTENSIONS = ('.xlsx', '.csv')
+WINDOW_CACHE_SIZE = 32
+SNAPSHOT_CACHE_BYTES = int(float(os.environ.get('MSY_SNAPSHOT_CACHE_MB', '1024')) * 1024 * 1024)
+
+# --- Ingestion Settings ---
+# 'process' fans month workbooks out to a process pool, 'thread' to a thread
+# pool and 'serial' parses them one by one (handy for debugging). Workers are
+# started with forkserver rather than fork: ingest runs next to the refresher
+# and request threads, and a forked child could inherit their held locks.
+INGEST_MODES = ('process', 'thread', 'serial')
+INGEST_MODE = os.environ.get('MSY_INGEST_MODE', 'process')
+INGEST_WORKERS = int(os.environ.get('MSY_INGEST_WORKERS', '0')) or None
+INGEST_START_METHOD = os.environ.get('MSY_INGEST_START_METHOD', 'forkserver')
+
+# --- Analysis Backend ---
+# 'pandas' aggregates the parsed workbooks in memory; 'sqlite' loads them into
+# the analytical store (sqlstore.py) and aggregates with SQL.
+ANALYSIS_BACKENDS = ('pandas', 'sqlite')
+ANALYSIS_BACKEND = os.environ.get('MSY_ANALYSIS_BACKEND', 'pandas')
+
+INGREDIENT_FILE = "MSY Data - Ingredient.csv"
+SHIPMENT_FILE = "MSY Data - Shipment.csv"
+
+# Header column that identifies what each Data_Matrix sheet holds
+SHEET_ROLES = {
+    'Group': 'revenue',      # usually 'data 1'
+    'Category': 'warehouse', # usually 'data 2'
+    'Item Name': 'items',    # usually 'data 3'
+}
+
 # --- Helper Functions ---
 
+def parse_number_column(values, symbols):
+    """
+    to_numeric() for a column of numbers and '$1,234.56'-style strings.
+    Only the string cells are rewritten, so numeric cells aren't copied
+    through str and back.
+    """
+    if values.dtype != object:
+        return pd.to_numeric(values, errors='coerce')
+    text = values.str
+    for symbol in symbols:
+        text = text.replace(symbol, '', regex=False).str
+    stripped = text.strip()
+    return pd.to_numeric(stripped.where(stripped.notna(), values), errors='coerce')
+
+@stage_timer("clean")
 def clean_data(df):
     """Cleans 'Amount' and 'Count' columns in a DataFrame."""
     if 'Amount' in df.columns:
-        df['Amount'] = df['Amount'].astype(str).str.replace(r'[$,]', '', regex=True)
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+        df['Amount'] = parse_number_column(df['Amount'], ('$', ','))
     
     if 'Count' in df.columns:
-        df['Count'] = df['Count'].astype(str).str.replace(',', '', regex=True)
-        df['Count'] = pd.to_numeric(df['Count'], errors='coerce')
+        df['Count'] = parse_number_column(df['Count'], (',',))
     
     return df
 
+def load_month_workbook(path):
+    """
+    Opens a month Data_Matrix workbook once and returns its cleaned sheets
+    keyed by role ('revenue', 'warehouse', 'items'). Roles come from each
+    sheet's header, so exports with shuffled sheets (e.g. October, where
+    'data 3' holds the Group totals) still load correctly.
+
+    Workbooks over MSY_STREAM_THRESHOLD_MB are streamed in row chunks
+    instead and reduced to per-key totals on the way in (see streaming.py).
+    """
+    if should_stream(path):
+        return stream_month_workbook(path, SHEET_ROLES, clean_data)
+
+    sheets = {}
+    with pd.ExcelFile(path) as workbook:
+        for sheet_name in workbook.sheet_names:
+            df = workbook.parse(sheet_name)
+            role = next((SHEET_ROLES[col] for col in df.columns if col in SHEET_ROLES), None)
+            if role is None:
+                log_event(log, logging.WARNING, "sheet_skipped", file=os.path.basename(path), sheet=sheet_name, reason="unknown layout")
+                continue
+            sheets[role] = clean_data(df)
+    return sheets
+
+def load_month_frames(path):
+    """
+    load_month_workbook() plus the month's partial aggregates, so both are
+    saved together in the month's snapshot.
+    """
+    sheets = load_month_workbook(path)
+    sheets.update(compute_month_partials(sheets))
+    return sheets
+
+def load_month(month, path):
+    """
+    Loads one month workbook for ingest_months(). Returns (month, sheets,
+    error) so a bad file is reported by the caller instead of killing the pool.
+    """
+    if not os.path.exists(path):
+        return month, None, "File NOT FOUND"
+    try:
+        return month, load_with_snapshot(path, load_month_frames), None
+    except Exception as e:
+        return month, None, str(e)
+
+def ingest_months(month_files, data_dir, mode=None, max_workers=None, cache=True):
+    """
+    Loads every month workbook in month_files ({month: file name}, as built
+    by discovery.build_month_index()) and returns {month: sheets} in the
+    same month order, skipping files that failed. Work is spread over a
+    process pool, a thread pool or done serially depending on mode
+    (defaults to INGEST_MODE). Months whose file is unchanged since the
+    last call are reused from memory and not loaded again; with
+    cache=False nothing is kept in memory after the call.
+    """
+    mode = mode or INGEST_MODE
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode '{mode}', expected one of {INGEST_MODES}")
+    max_workers = max_workers or INGEST_WORKERS or min(len(month_files), os.cpu_count() or 1)
+    paths = {month: os.path.join(data_dir, file_name) for month, file_name in month_files.items()}
+
+    cached = {}
+    with _cache_lock:
+        for month, path in paths.items():
+            entry = _month_cache.get(path)
+            if entry is not None and os.path.exists(path) and entry[0] == get_file_key(path):
+                cached[month] = entry[1]
+            record_cache("month", month in cached)
+    jobs = [(month, path) for month, path in paths.items() if month not in cached]
+
+    if not jobs:
+        results = []
+    elif mode == 'serial' or max_workers <= 1 or len(jobs) <= 1:
+        results = [load_month(month, path) for month, path in jobs]
+    else:
+        results = None
+        if mode == 'process':
+            try:
+                context = multiprocessing.get_context(INGEST_START_METHOD)
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                    results = list(pool.map(load_month, *zip(*jobs)))
+            except (OSError, NotImplementedError, RuntimeError, ValueError) as e:
+                log_event(log, logging.WARNING, "process_pool_unavailable", error=str(e), fallback="thread")
+        if results is None:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(load_month, *zip(*jobs)))
+
+    for (month, path), (_, sheets, error) in zip(jobs, results):
+        if error is not None:
+            log_event(log, logging.ERROR, "file_failed", file=os.path.basename(path), error=error)
+            continue
+        sheet_roles = sorted(role for role in sheets if role in SHEET_ROLES.values())
+        rows = sum(len(sheets[role]) for role in sheet_roles)
+        FILES_PARSED.inc(kind="month")
+        ROWS_PROCESSED.inc(rows, stage="ingest")
+        log_event(log, logging.INFO, "file_parsed", file=os.path.basename(path), sheets=sheet_roles, rows=rows)
+        cached[month] = sheets
+        if cache:
+            with _cache_lock:
+                _month_cache[path] = (get_file_key(path), sheets, sum(frame_bytes(frame) for frame in sheets.values()))
+
+    return {month: cached[month] for month in paths if month in cached}
+
+def build_snapshots(data_dir=None):
+    """
+    Converts every month workbook and the Ingredient/Shipment CSVs in
+    data_dir (default: every store location) into Arrow snapshots, skipping
+    ones that are already fresh.
+    """
+    data_dirs = [data_dir] if data_dir else list_locations(get_default_data_dir()).values()
+    for data_dir in data_dirs:
+        ingest_months(build_month_index(data_dir), data_dir, cache=False)
+        for file_name in (INGREDIENT_FILE, SHIPMENT_FILE):
+            read_csv_snapshot(os.path.join(data_dir, file_name))
+
+def get_bom_rules_file(data_dir):
+    """data_dir's own bom_rules.json if it has one, otherwise the bundled rules."""
+    rules_file = os.path.join(data_dir, os.path.basename(BOM_RULES_FILE))
+    return rules_file if os.path.exists(rules_file) else BOM_RULES_FILE
+
+def get_bill_of_materials(data_dir):
+    """Compiled (cached) bill of materials for data_dir's Ingredient CSV."""
+    return load_bill_of_materials(os.path.join(data_dir, INGREDIENT_FILE), read_csv_snapshot,
+                                  get_bom_rules_file(data_dir))
+
 # --- Inventory Analysis Function ---
 
-def get_inventory_analysis(data_dir, all_items_df):
+def load_inventory_inputs(data_dir):
     """
-    Analyzes sales data against ingredient recipes and shipments
-    to predict inventory status.
+    Loads the bill of materials and the shipment schedule for data_dir.
+    Returns (bom, shipment_df), or None if either file can't be read.
     """
-    
-    # --- 1. Load Ingredient & Shipment Files (as CSVs) ---
-    ingredient_file = os.path.join(data_dir, "MSY Data - Ingredient.csv")
-    shipment_file = os.path.join(data_dir, "MSY Data - Shipment.csv")
+    shipment_file = os.path.join(data_dir, SHIPMENT_FILE)
     
     try:
-        recipe_df = pd.read_csv(ingredient_file)
-        print("[SUCCESS] Processed: MSY Data - Ingredient.csv")
+        bom = get_bill_of_materials(data_dir)
     except Exception as e:
-        print(f"[ERROR] Could not read {ingredient_file}: {e}")
-        return "{}", "{}", []
+        log_event(log, logging.ERROR, "file_failed", file=INGREDIENT_FILE, error=str(e))
+        return None
 
     try:
-        shipment_df = pd.read_csv(shipment_file)
-        print("[SUCCESS] Processed: MSY Data - Shipment.csv")
+        shipment_df = read_csv_snapshot(shipment_file)
     except Exception as e:
-        print(f"[ERROR] Could not read {shipment_file}: {e}")
+        log_event(log, logging.ERROR, "file_failed", file=SHIPMENT_FILE, error=str(e))
+        return None
+    return bom, shipment_df
+
+@stage_timer("inventory")
+def get_inventory_analysis(data_dir, all_items_df, n_months=6):
+    """
+    Analyzes sales data against ingredient recipes and shipments
+    to predict inventory status.
+    """
+    
+    # --- 1. Load Ingredient & Shipment Files (as CSVs) ---
+    inputs = load_inventory_inputs(data_dir)
+    if inputs is None:
         return "{}", "{}", []
+    bom, shipment_df = inputs
 
-    # --- 2. Calculate Total Item Sales (6 Months) ---
-    total_sales_df = all_items_df.groupby('Item Name')['Count'].sum().reset_index()
-    total_sales_df = total_sales_df.rename(columns={'Count': 'Total_6_Month_Sales'})
+    # --- 2. Calculate Total Item Sales (all loaded months) ---
+    total_sales = all_items_df.groupby('Item Name', observed=True)['Count'].sum()
 
-    # --- 3. Parse Ingredient Units & Clean Headers ---
-    ingredient_units = {}
-    new_columns = {}
-    unit_pattern = re.compile(r'\s?\((g|pcs|count)\)')
-    
-    for col in recipe_df.columns:
-        match = unit_pattern.search(col)
-        if match:
-            unit = match.group(1)
-            clean_name = unit_pattern.sub('', col)
-            ingredient_units[clean_name] = unit
-            new_columns[col] = clean_name
-        else:
-            ingredient_units[col] = 'g' 
-            new_columns[col] = col
-            
-    recipe_df = recipe_df.rename(columns=new_columns)
-    recipe_df = recipe_df.rename(columns={'Item name': 'Item Name'})
-    ingredient_units['Item Name'] = 'text'
-    
-    recipe_df = recipe_df.set_index('Item Name').fillna(0)
+    # --- 3. Calculate Ingredient Usage from the Bill of Materials ---
+    total_usage = bom.ingredient_usage(bom.sales_vector(total_sales))
+    avg_ingredient_usage = total_usage / n_months
+    return analyze_inventory(bom, shipment_df, avg_ingredient_usage)
 
-    # --- 4. Combine Chicken Units ---
-    recipe_df['Total_Chicken_Usage'] = recipe_df['Braised Chicken'] + (recipe_df['chicken thigh'] * 100)
-    ingredient_units['Total_Chicken_Usage'] = 'g'
-    recipe_df = recipe_df.drop(columns=['Braised Chicken', 'chicken thigh'])
+def get_shipment_usage(snapshot):
+    """
+    (bom, shipment_df, average monthly usage per bom shipment item) over
+    the snapshot's months, read from its usage cube; None without recipes
+    and shipments.
+    """
+    cubes = snapshot['frames']['cubes']
+    inputs = load_inventory_inputs(snapshot['data_dir']) if 'ingredient_usage' in cubes else None
+    if inputs is None:
+        return None
+    bom, shipment_df = inputs
+    start, end = get_window_bounds(snapshot)
+    avg_ingredient_usage = cubes['ingredient_usage'].window_total(start, end) / (end - start + 1)
+    return bom, shipment_df, bom.shipment_usage(avg_ingredient_usage)
+
+def get_stock_projection(snapshot, horizon_days=None):
+    """
+    Day-by-day stock projection (see projection.project_shipments) for the
+    snapshot's months, or None without recipes and shipments. Returns
+    (table, on_hand).
+    """
+    usage = get_shipment_usage(snapshot)
+    return None if usage is None else project_shipments(*usage, horizon_days)
 
-    # --- 5. Calculate Total Ingredient Usage (6 Months) ---
-    usage_df = total_sales_df.merge(recipe_df, left_on='Item Name', right_index=True, how='inner')
-    
-    ingredient_columns = recipe_df.columns
-    total_usage = {}
-    for col in ingredient_columns:
-        total_usage[col] = (usage_df[col] * usage_df['Total_6_Month_Sales']).sum()
-    
-    total_usage_df = pd.DataFrame.from_dict(total_usage, orient='index', columns=['Total_6_Month_Usage'])
-    total_usage_df['Avg_Monthly_Usage'] = total_usage_df['Total_6_Month_Usage'] / 6
-    total_usage_df.index.name = 'Ingredient_Recipe_Name'
-    
-    # --- 6. Calculate Monthly Shipment Volume & Normalize Units ---
-    
-    def normalize_frequency(freq):
-        freq = str(freq).lower()
-        if 'weekly' in freq: return 4
-        if 'biweekly' in freq: return 2
-        if 'monthly' in freq: return 1
-        return 0
+def analyze_inventory(bom, shipment_df, avg_ingredient_usage):
+    """
+    Compares average monthly ingredient usage (aligned with bom.ingredients)
+    against the shipment schedule. Returns (table JSON, chart data, alerts).
+    """
+    # --- 4. Roll Ingredient Usage Up to Shipment Items (see bom_rules.json) ---
+    avg_shipment_usage = bom.shipment_usage(avg_ingredient_usage)
 
-    shipment_df['Shipments_Per_Month'] = shipment_df['frequency'].apply(normalize_frequency)
-    shipment_df['Total_Shipped_Per_Month'] = shipment_df['Quantity per shipment'] * shipment_df['Number of shipments'] * shipment_df['Shipments_Per_Month']
-    
-    unit_conversions = {
-        'lbs': 453.592, 'rolls': 1, 'pieces': 1, 'eggs': 1, 'whole onion': 150
-    }
-    
-    shipment_df['Conversion_Factor'] = shipment_df['Unit of shipment'].map(unit_conversions).fillna(1)
-    shipment_df['Total_Shipped_Per_Month_Converted'] = shipment_df['Total_Shipped_Per_Month'] * shipment_df['Conversion_Factor']
-    
-    # --- 7. Map Shipment Ingredients to Recipe Ingredients ---
-    ingredient_map = {
-        'Beef': 'braised beef used',
-        'Chicken': 'Total_Chicken_Usage',
-        'Ramen': 'Ramen',
-        'Rice Noodles': 'Rice Noodles',
-        'Flour': 'flour',
-        'Tapioca Starch': 'Tapioca Starch',
-        'Rice': 'Rice',
-        'Green Onion': 'Green Onion',
-        'White Onion': 'White onion',
-        'Cilantro': 'Cilantro',
-        'Egg': 'Egg',
-        'Peas + Carrot': 'Peas',
-        'Bokchoy': 'Boychoy',
-        'Chicken Wings': 'Chicken Wings'
-    }
-    
-    shipment_df_final = shipment_df.set_index('Ingredient')
-    analysis_data = []
-    
-    for shipment_name, recipe_name in ingredient_map.items():
-        if shipment_name in shipment_df_final.index and recipe_name in total_usage_df.index:
-            monthly_usage = total_usage_df.loc[recipe_name, 'Avg_Monthly_Usage']
-            monthly_shipment = shipment_df_final.loc[shipment_name, 'Total_Shipped_Per_Month_Converted']
-            unit = ingredient_units.get(recipe_name, 'g')
-
-            if shipment_name == 'Peas + Carrot':
-                peas_usage = total_usage_df.loc['Peas', 'Avg_Monthly_Usage']
-                carrot_usage = total_usage_df.loc['Carrot', 'Avg_Monthly_Usage']
-                total_usage_pc = peas_usage + carrot_usage
-                delta = monthly_shipment - total_usage_pc
-                analysis_data.append({'Ingredient': 'Peas & Carrot', 'Unit': 'g', 'Avg_Monthly_Usage': total_usage_pc, 'Monthly_Shipment': monthly_shipment, 'Stock_Delta': delta})
-            else:
-                delta = monthly_shipment - monthly_usage
-                analysis_data.append({'Ingredient': shipment_name, 'Unit': unit, 'Avg_Monthly_Usage': monthly_usage, 'Monthly_Shipment': monthly_shipment, 'Stock_Delta': delta})
-
-    analysis_df = pd.DataFrame(analysis_data)
+    # --- 5. Project Stock Day by Day on Each Item's Delivery Cadence ---
+    projection, _ = project_shipments(bom, shipment_df, avg_shipment_usage)
+
+    # --- 6. Compare Shipments Against Usage ---
+    analysis_df = projection
+    analysis_df['Monthly_Shipment'] = analysis_df['Delivery_Quantity'] * analysis_df['Shipments_Per_Month']
+    analysis_df['Stock_Delta'] = analysis_df['Monthly_Shipment'] - analysis_df['Avg_Monthly_Usage']
+    analysis_df = analysis_df[['Ingredient', 'Unit', 'Avg_Monthly_Usage', 'Monthly_Shipment', 'Stock_Delta',
+                               'Days_Until_Stockout']].reset_index(drop=True)
     
     if analysis_df.empty:
         return "{}", {}, []
 
-    # --- 8. Format for Dashboard ---
-    
-    def assign_status(row):
-        avg_monthly_usage = row['Avg_Monthly_Usage']
-        stock_delta = row['Stock_Delta']
-        
-        status = 'Stocked'
-        note = 'Buffer is 1-6 weeks'
-        
-        if avg_monthly_usage <= 0:
-            if stock_delta > 0:
-                status = 'Surplus'
-                note = 'Stocked but not sold'
-            else:
-                status = 'Stocked'
-                note = 'No sales data'
-            return status, note
-
-        safety_stock_buffer = avg_monthly_usage * 0.25
-        surplus_buffer = avg_monthly_usage * 1.5
-
-        if stock_delta < safety_stock_buffer:
-            status = 'Low Stock'
-            note = 'Buffer is < 1 week of usage'
-        elif stock_delta > surplus_buffer:
-            status = 'Surplus'
-            note = 'Buffer is > 6 weeks of usage'
-
-        return status, note
-
-    analysis_df[['Status', 'Note']] = analysis_df.apply(assign_status, axis=1, result_type='expand')
+    # --- 7. Format for Dashboard ---
+    rules = classify_stock(analysis_df['Avg_Monthly_Usage'], analysis_df['Stock_Delta'])
+    analysis_df['Status'] = [STOCK_RULES[rule][0] for rule in rules]
+    analysis_df['Note'] = [STOCK_RULES[rule][1] for rule in rules]
     analysis_df = analysis_df.round(0)
     
     # --- NEW: Generate Low Stock Alerts ---
@@ -188,11 +332,14 @@ def get_inventory_analysis(data_dir, all_items_df):
     
     current_date = datetime.now().strftime("%B %d, %Y")
     
-    for idx, row in low_stock_items.iterrows():
+    for ingredient, days_left in low_stock_items[['Ingredient', 'Days_Until_Stockout']].itertuples(index=False):
+        message = f"Low stock alert: {ingredient} buffer is less than 1 week of usage"
+        if not pd.isna(days_left):
+            message += f", projected to run out in {int(days_left)} days"
         alert = {
             'date': current_date,
-            'ingredient': row['Ingredient'],
-            'message': f"Low stock alert: {row['Ingredient']} buffer is less than 1 week of usage",
+            'ingredient': ingredient,
+            'message': message,
             'icon': 'fa-exclamation-triangle',
             'color': 'warning'
         }
@@ -204,24 +351,14 @@ def get_inventory_analysis(data_dir, all_items_df):
     # --- Chart: Data for Chart.js ---
     analysis_df = analysis_df.sort_values(by='Stock_Delta')
     
-    def assign_chart_color(status):
-        if status == 'Low Stock':
-            return 'rgba(231, 74, 59, 0.8)'
-        elif status == 'Surplus':
-            return 'rgba(246, 194, 62, 0.8)'
-        else:
-            return 'rgba(28, 200, 138, 0.8)'
-
-    def assign_border_color(status):
-        if status == 'Low Stock':
-            return 'rgba(231, 74, 59, 1)'
-        elif status == 'Surplus':
-            return 'rgba(246, 194, 62, 1)'
-        else:
-            return 'rgba(28, 200, 138, 1)'
-
-    analysis_df['Color'] = analysis_df['Status'].apply(assign_chart_color)
-    analysis_df['BorderColor'] = analysis_df['Status'].apply(assign_border_color)
+    # (fill, border) colors per status; anything else counts as Stocked
+    status_colors = {
+        'Low Stock': ('rgba(231, 74, 59, 0.8)', 'rgba(231, 74, 59, 1)'),
+        'Surplus': ('rgba(246, 194, 62, 0.8)', 'rgba(246, 194, 62, 1)'),
+    }
+    stocked_colors = ('rgba(28, 200, 138, 0.8)', 'rgba(28, 200, 138, 1)')
+    analysis_df['Color'] = analysis_df['Status'].map({k: v[0] for k, v in status_colors.items()}).fillna(stocked_colors[0])
+    analysis_df['BorderColor'] = analysis_df['Status'].map({k: v[1] for k, v in status_colors.items()}).fillna(stocked_colors[1])
 
     inventory_chart_data = {
         'labels': analysis_df['Ingredient'].tolist(),
@@ -233,134 +370,418 @@ def get_inventory_analysis(data_dir, all_items_df):
     
     return inventory_table_data, inventory_chart_data, low_stock_alerts
 
-# --- Main Data Analysis Function ---
+# --- Cache Helpers ---
 
-def get_dashboard_data():
+def get_default_data_dir():
+    """Returns $MSY_DATA_DIR, or the bundled website/data/ directory."""
+    if os.environ.get('MSY_DATA_DIR'):
+        return os.path.abspath(os.environ['MSY_DATA_DIR'])
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_dir, 'data')
+
+def get_location_dir(location=None):
     """
-    Reads all XLSX files from the data/ folder and returns key metrics
-    for the Flask dashboard.
+    Data folder of a store location under the data directory (see
+    locations.py); the default location if None. Raises ValueError for
+    unknown locations.
     """
-    base_dir = os.path.abspath(os.path.dirname(__file__))
-    data_dir = os.path.join(base_dir, 'data')
-
-    print("--- Dashboard Analysis (XLSX Mode) ---")
-    print(f"Looking for data files in: {data_dir}")
-    print("--------------------------------------")
-
-    # --- 1. Monthly Revenue Analysis (data 1) ---
-    group_files = {
-        "May":       {"file": "May_Data_Matrix.xlsx", "sheet": "data 1"},
-        "June":      {"file": "June_Data_Matrix.xlsx", "sheet": "data 1"},
-        "July":      {"file": "July_Data_Matrix.xlsx", "sheet": "data 1"},
-        "August":    {"file": "August_Data_Matrix.xlsx", "sheet": "data 1"},
-        "September": {"file": "September_Data_Matrix.xlsx", "sheet": "data 1"},
-        "October":   {"file": "October_Data_Matrix_20251103_214000.xlsx", "sheet": "data 3"}
-    }
-    monthly_revenue = []
-    for month, info in group_files.items():
-        full_path = os.path.join(data_dir, info['file'])
-        sheet_name = info['sheet']
-        if not os.path.exists(full_path):
-            print(f"[ERROR] File NOT FOUND: {full_path}")
-            continue
-        try:
-            df = pd.read_excel(full_path, sheet_name=sheet_name)
-            df = clean_data(df)
-            total_revenue = df['Amount'].sum()
-            monthly_revenue.append({"Month": month, "Total_Revenue": total_revenue})
-            print(f"[SUCCESS] Processed: {info['file']} (Sheet: {sheet_name})")
-        except Exception as e:
-            print(f"[ERROR] Failed to process {full_path} (Sheet: {sheet_name}): {e}")
-    if not monthly_revenue:
-        raise FileNotFoundError(f"No 'Group' data was loaded. Check files in '{data_dir}'.")
-    revenue_df = pd.DataFrame(monthly_revenue)
-    month_order = ["May", "June", "July", "August", "September", "October"]
-    revenue_df['Month'] = pd.Categorical(revenue_df['Month'], categories=month_order, ordered=True)
-    revenue_df = revenue_df.sort_values('Month')
+    return resolve_location(get_default_data_dir(), location)
 
-    # --- 2. Top Items Analysis (data 3) ---
-    item_files = {
-        "May":       {"file": "May_Data_Matrix.xlsx", "sheet": "data 3"},
-        "June":      {"file": "June_Data_Matrix.xlsx", "sheet": "data 3"},
-        "July":      {"file": "July_Data_Matrix.xlsx", "sheet": "data 3"},
-        "August":    {"file": "August_Data_Matrix.xlsx", "sheet": "data 3"},
-        "September": {"file": "September_Data_Matrix.xlsx", "sheet": "data 3"},
-        "October":   {"file": "October_Data_Matrix_20251103_214000.xlsx", "sheet": "data 3"} 
-    }
-    all_items = []
-    for month, info in item_files.items():
-        full_path = os.path.join(data_dir, info['file'])
-        sheet_name = info['sheet']
-        if not os.path.exists(full_path):
-            print(f"[ERROR] File NOT FOUND: {full_path}")
+def get_data_fingerprint(data_dir):
+    """
+    Returns a hashable fingerprint of the source files in data_dir
+    (name, mtime, size). Any added, removed or touched file changes it.
+    The bill-of-materials rules file in use is included too.
+    """
+    rules_file = get_bom_rules_file(data_dir)
+    rules_stat = os.stat(rules_file)
+    entries = [(rules_file, rules_stat.st_mtime_ns, rules_stat.st_size)]
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(DATA_FILE_EXTENSIONS):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+def get_dashboard_snapshot(data_dir=None, allow_stale=False):
+    """
+    Returns the cached dashboard snapshot for data_dir, rebuilding it only
+    when the data fingerprint has changed. The snapshot is a dict holding the
+    dashboard 'bundle', the intermediate 'frames' and its 'version'.
+
+    With allow_stale, whatever snapshot is cached is returned as-is and the
+    rebuild is left to the background refresher (stale-while-revalidate).
+    """
+    data_dir = data_dir or get_location_dir()
+    if allow_stale:
+        with _cache_lock:
+            snapshot = _dashboard_cache.get(data_dir)
+            if snapshot is not None:
+                _dashboard_cache.move_to_end(data_dir)
+                _cache_stats['hits'] += 1
+                record_cache("dashboard", True)
+                return snapshot
+
+    fingerprint = get_data_fingerprint(data_dir)
+    with _cache_lock:
+        snapshot = _dashboard_cache.get(data_dir)
+        if snapshot is not None and snapshot['fingerprint'] == fingerprint:
+            _dashboard_cache.move_to_end(data_dir)
+            _cache_stats['hits'] += 1
+            record_cache("dashboard", True)
+            return snapshot
+
+    # Only one rebuild runs at a time; readers keep using the old snapshot
+    with _build_lock:
+        fingerprint = get_data_fingerprint(data_dir)
+        with _cache_lock:
+            snapshot = _dashboard_cache.get(data_dir)
+            if snapshot is not None and snapshot['fingerprint'] == fingerprint:
+                _dashboard_cache.move_to_end(data_dir)
+                _cache_stats['hits'] += 1
+                record_cache("dashboard", True)
+                return snapshot
+            _cache_stats['misses'] += 1
+        record_cache("dashboard", False)
+
+        start = time.perf_counter()
+        with stage_timer("build"):
+            bundle, frames = build_dashboard_data(data_dir)
+        elapsed = time.perf_counter() - start
+        SNAPSHOT_BUILD_SECONDS.set(elapsed, data_dir=data_dir)
+        frames_bytes = 0
+        for name, usage in memory_report(frames).items():
+            FRAME_BYTES.set(usage['bytes'], data_dir=data_dir, frame=name)
+            frames_bytes += usage['bytes']
+
+        snapshot = {
+            'data_dir': data_dir,
+            'fingerprint': fingerprint,
+            # Stores with identical file names/sizes/mtimes still get distinct versions
+            'version': hashlib.sha1(repr((data_dir, fingerprint)).encode()).hexdigest()[:12],
+            'bundle': bundle,
+            'frames': frames,
+            'built_at': datetime.now(),
+            'build_seconds': elapsed,
+            'frames_bytes': frames_bytes,
+            # Running totals only change when the store is rebuilt
+            'aggregate_bytes': aggregate_store_bytes(data_dir),
+        }
+        summary = summarize_snapshot(snapshot)
+        with _cache_lock:
+            _dashboard_cache[data_dir] = snapshot
+            _dashboard_cache.move_to_end(data_dir)
+            _location_summaries[data_dir] = summary
+            evict_snapshots(keep=data_dir)
+            _cache_stats['rebuilds'] += 1
+            _cache_stats['last_rebuild_seconds'] = elapsed
+            _cache_stats['total_rebuild_seconds'] += elapsed
+        log_event(log, logging.INFO, "dashboard_build_finished", data_dir=data_dir,
+                  version=snapshot['version'], seconds=elapsed)
+        return snapshot
+
+def get_resident_bytes(data_dir):
+    """
+    Bytes held in this process for one store: its snapshot frames and month
+    cubes, the parsed months and running aggregates kept for incremental
+    rebuilds, and its cached window snapshots and forecasts. Called with
+    _cache_lock held.
+    """
+    snapshot = _dashboard_cache.get(data_dir)
+    if snapshot is None:
+        return 0
+    return (snapshot.get('frames_bytes', 0)
+            + sum(entry[2] for path, entry in _month_cache.items() if os.path.dirname(path) == data_dir)
+            + sum(window['frames_bytes'] for key, window in _window_cache.items() if key[0] == data_dir)
+            + snapshot.get('aggregate_bytes', 0)
+            + forecast_bytes(snapshot['version']))
+
+def evict_snapshots(keep):
+    """
+    Drops the least recently used snapshots, with their parsed months,
+    window snapshots, forecasts and running aggregates, until everything
+    held for the resident stores (see get_resident_bytes) fits
+    SNAPSHOT_CACHE_BYTES. keep and background-refreshed folders stay.
+    Called with _cache_lock held.
+    """
+    sizes = {data_dir: get_resident_bytes(data_dir) for data_dir in _dashboard_cache}
+    resident = sum(sizes.values())
+    for data_dir in list(_dashboard_cache):
+        if resident <= SNAPSHOT_CACHE_BYTES:
+            break
+        if data_dir == keep or data_dir in _background_refresh_dirs:
             continue
-        try:
-            df = pd.read_excel(full_path, sheet_name=sheet_name)
-            df = clean_data(df)
-            df['Month'] = month
-            all_items.append(df)
-            print(f"[SUCCESS] Processed: {info['file']} (Sheet: {sheet_name})")
-        except Exception as e:
-            print(f"[ERROR] Failed to process item file {full_path} (Sheet: {sheet_name}): {e}")
-    if not all_items:
-        raise FileNotFoundError(f"No 'Item' (data 3) data was loaded. Check files in '{data_dir}'.")
-    
-    item_df = pd.concat(all_items, ignore_index=True)
-    
-    months_of_data = item_df.groupby('Item Name')['Month'].nunique().reset_index().rename(columns={'Month': 'Months_Data'})
-    top_items = item_df.groupby('Item Name')[['Amount', 'Count']].sum().reset_index()
-    top_items = top_items.sort_values(by='Amount', ascending=False)
-    top_items = top_items.merge(months_of_data, on='Item Name', how='left')
-    top_items['Avg_Price'] = top_items['Amount'] / top_items['Count']
+        snapshot = _dashboard_cache.pop(data_dir)
+        resident -= sizes[data_dir]
+        for path in [path for path in _month_cache if os.path.dirname(path) == data_dir]:
+            del _month_cache[path]
+        for key in [key for key in _window_cache if key[0] == data_dir]:
+            del _window_cache[key]
+        drop_aggregate_store(data_dir)
+        drop_forecasts(snapshot['version'])
+        _cache_stats['evictions'] += 1
+        SNAPSHOT_EVICTIONS.inc()
+        log_event(log, logging.INFO, "snapshot_evicted", data_dir=data_dir, version=snapshot['version'],
+                  bytes=sizes[data_dir], resident_bytes=resident)
+
+def get_cache_stats():
+    """Returns a copy of the dashboard cache counters."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats['cached_dirs'] = len(_dashboard_cache)
+        stats['resident_bytes'] = sum(get_resident_bytes(data_dir) for data_dir in _dashboard_cache)
+        stats['budget_bytes'] = SNAPSHOT_CACHE_BYTES
+    return stats
+
+def get_location_status():
+    """
+    {location: {'data_dir', 'loaded', 'version', 'resident_bytes'}} for
+    every store, from what is cached right now (nothing is built).
+    """
+    status = {}
+    with _cache_lock:
+        for name, data_dir in list_locations(get_default_data_dir()).items():
+            snapshot = _dashboard_cache.get(data_dir)
+            summary = _location_summaries.get(data_dir)
+            status[name] = {
+                "data_dir": data_dir,
+                "loaded": snapshot is not None,
+                "version": (snapshot or summary or {}).get('version'),
+                "resident_bytes": get_resident_bytes(data_dir),
+            }
+    return status
+
+def get_memory_report(data_dir=None):
+    """
+    Bytes held in memory for data_dir: each frame of the current snapshot
+    (see schema.memory_report), the parsed month sheets and running
+    aggregates kept for incremental rebuilds, and the cached window
+    snapshots and forecasts. total_bytes is what counts against
+    SNAPSHOT_CACHE_BYTES.
+    """
+    snapshot = get_current_snapshot(data_dir)
+    data_dir = snapshot['data_dir']
+    frames = memory_report(snapshot['frames'])
+    with _cache_lock:
+        month_sizes = [entry[2] for path, entry in _month_cache.items() if os.path.dirname(path) == data_dir]
+        window_bytes = sum(window['frames_bytes'] for key, window in _window_cache.items() if key[0] == data_dir)
+    frames_bytes = sum(usage['bytes'] for usage in frames.values())
+    report = {
+        "version": snapshot['version'],
+        "frames": frames,
+        "frames_bytes": frames_bytes,
+        "month_cache_files": len(month_sizes),
+        "month_cache_bytes": sum(month_sizes),
+        "aggregate_bytes": snapshot.get('aggregate_bytes', 0),
+        "window_cache_bytes": window_bytes,
+        "forecast_bytes": forecast_bytes(snapshot['version']),
+    }
+    report["total_bytes"] = sum(value for key, value in report.items() if key.endswith("_bytes"))
+    return report
+
+def set_background_refresh(data_dir, enabled):
+    """
+    Marks data_dir as kept fresh by a background refresher, so request-path
+    reads serve the cached snapshot instead of rebuilding inline.
+    """
+    with _cache_lock:
+        if enabled:
+            _background_refresh_dirs.add(data_dir)
+        else:
+            _background_refresh_dirs.discard(data_dir)
+
+def set_shared_reader(data_dir, reader):
+    """
+    Serves data_dir from reader.get() (see shared.SharedSnapshotReader)
+    instead of building in this process; None goes back to local builds.
+    """
+    with _cache_lock:
+        if reader is None:
+            _shared_readers.pop(data_dir, None)
+        else:
+            _shared_readers[data_dir] = reader
+
+def invalidate_cache(data_dir=None):
+    """Drops the cached snapshot for data_dir (or every snapshot if None)."""
+    with _cache_lock:
+        if data_dir is None:
+            _dashboard_cache.clear()
+            _location_summaries.clear()
+        else:
+            _dashboard_cache.pop(data_dir, None)
+            _location_summaries.pop(data_dir, None)
+
+# --- Main Data Analysis Function ---
 
-    # --- 3. Load 'data 2' (Warehouse data) separately ---
-    warehouse_files = {
-        "May":       {"file": "May_Data_Matrix.xlsx", "sheet": "data 2"},
-        "June":      {"file": "June_Data_Matrix.xlsx", "sheet": "data 2"},
-        "July":      {"file": "July_Data_Matrix.xlsx", "sheet": "data 2"},
-        "August":    {"file": "August_Data_Matrix.xlsx", "sheet": "data 2"},
-        "September": {"file": "September_Data_Matrix.xlsx", "sheet": "data 2"},
-        "October":   {"file": "October_Data_Matrix_20251103_214000.xlsx", "sheet": "data 2"}
+def get_current_snapshot(data_dir=None):
+    """
+    Returns the snapshot requests should read: the published one in shared
+    mode, the cached one when a background refresher keeps data_dir fresh,
+    otherwise a checked one. data_dir defaults to the default location.
+    """
+    data_dir = data_dir or get_location_dir()
+    reader = _shared_readers.get(data_dir)
+    if reader is not None:
+        snapshot = reader.get()
+        if snapshot is not None:
+            return snapshot
+        log_event(log, logging.WARNING, "shared_snapshot_missing", data_dir=data_dir, fallback="local build")
+    allow_stale = data_dir in _background_refresh_dirs
+    return get_dashboard_snapshot(data_dir, allow_stale=allow_stale)
+
+def get_dashboard_data(data_dir=None):
+    """
+    Returns key metrics for the Flask dashboard, served from the in-memory
+    cache unless the files in the data/ folder have changed.
+    """
+    return dict(get_current_snapshot(data_dir)['bundle'])
+
+# --- Chain Rollups ---
+
+def get_location_summary(data_dir):
+    """
+    The chain-rollup summary of one store (see locations.summarize_snapshot).
+    Kept after the store's snapshot is evicted and reused while its files
+    are unchanged, so rollups don't rebuild cold stores.
+    """
+    fingerprint = get_data_fingerprint(data_dir)
+    with _cache_lock:
+        summary = _location_summaries.get(data_dir)
+    record_cache("location_summary", summary is not None and summary['fingerprint'] == fingerprint)
+    if summary is not None and summary['fingerprint'] == fingerprint:
+        return summary
+    summary = summarize_snapshot(get_current_snapshot(data_dir))
+    with _cache_lock:
+        _location_summaries[data_dir] = summary
+    return summary
+
+def get_chain_summaries():
+    """{location: summary} for every store location, in list_locations() order."""
+    locations = list_locations(get_default_data_dir())
+    if not locations:
+        raise FileNotFoundError(f"No store data was found in '{get_default_data_dir()}'.")
+    return {name: get_location_summary(data_dir) for name, data_dir in locations.items()}
+
+# --- Date-Range Windows ---
+
+def get_months(snapshot):
+    """Chronological month labels of a snapshot."""
+    return list(snapshot['frames']['cubes']['item_count'].months)
+
+def get_window_bounds(snapshot):
+    """Inclusive month positions (start, end) of a snapshot's cubes that its window covers."""
+    months = get_months(snapshot)
+    first, last = snapshot.get('window', (months[0], months[-1]))
+    return months.index(first), months.index(last)
+
+def get_window_snapshot(snapshot, start=None, end=None, last=None):
+    """
+    Returns snapshot restricted to a month window (see cubes.resolve_window),
+    or snapshot itself when no window (or the full range) is asked for.
+    Window totals come from the snapshot's prefix-sum cubes and the result
+    is memoized, so repeat window requests cost a dictionary lookup.
+    """
+    months = get_months(snapshot)
+    window = resolve_window(months, start, end, last)
+    if window is None or window == (0, len(months) - 1):
+        return snapshot
+
+    key = (snapshot['data_dir'], snapshot['version'], window)
+    with _cache_lock:
+        window_snapshot = _window_cache.get(key)
+        if window_snapshot is not None:
+            _window_cache.move_to_end(key)
+    record_cache("window", window_snapshot is not None)
+    if window_snapshot is not None:
+        return window_snapshot
+
+    with stage_timer("window"):
+        window_snapshot = build_window_snapshot(snapshot, *window)
+    with _cache_lock:
+        _window_cache[key] = window_snapshot
+        while len(_window_cache) > WINDOW_CACHE_SIZE:
+            _window_cache.popitem(last=False)
+        if snapshot['data_dir'] in _dashboard_cache:
+            evict_snapshots(keep=snapshot['data_dir'])
+    return window_snapshot
+
+def build_window_snapshot(snapshot, start, end):
+    """Builds the bundle and frames for month positions start..end."""
+    frames = snapshot['frames']
+    cubes = frames['cubes']
+    months = get_months(snapshot)
+    window_months = months[start:end + 1]
+
+    # --- Monthly revenue for the window ---
+    revenue_df = frames['revenue_df']
+    revenue_df = revenue_df[revenue_df['Month'].isin(window_months)].copy()
+    revenue_df['Month'] = pd.Categorical(revenue_df['Month'].astype(str), categories=window_months, ordered=True)
+    if revenue_df.empty:
+        raise ValueError(f"No revenue data between {window_months[0]} and {window_months[-1]}")
+
+    # --- Item and category totals from two prefix rows each ---
+    counts = cubes['item_count'].window_series(start, end)
+    months_data = cubes['item_months'].window_series(start, end)
+    sold = months_data > 0
+    top_items = pd.DataFrame({
+        'Item Name': counts.index[sold],
+        'Amount': cubes['item_amount'].window_series(start, end)[sold].round(2).to_numpy(),
+        'Count': counts[sold].round().astype('int64').to_numpy(),
+        'Months_Data': months_data[sold].round().astype('int64').to_numpy(),
+    })
+    if top_items.empty:
+        raise ValueError(f"No item sales between {window_months[0]} and {window_months[-1]}")
+    top_items = top_items.sort_values(by='Amount', ascending=False).reset_index(drop=True)
+    top_items['Avg_Price'] = top_items['Amount'] / top_items['Count']
+    item_sales = top_items.set_index('Item Name')['Count'].sort_index()
+    category_revenue = cubes['category_revenue'].window_series(start, end).round(2)
+
+    # --- Average monthly ingredient usage over the window ---
+    inventory = "{}", "{}", []
+    inputs = load_inventory_inputs(snapshot['data_dir']) if 'ingredient_usage' in cubes else None
+    if inputs is not None:
+        avg_ingredient_usage = cubes['ingredient_usage'].window_total(start, end) / len(window_months)
+        inventory = analyze_inventory(*inputs, avg_ingredient_usage)
+
+    bundle = format_dashboard_bundle(revenue_df, window_months[-1], top_items, item_sales, category_revenue, inventory)
+    item_df = frames['item_df']
+    # The cubes are shared with the full snapshot; only these frames are new
+    window_frames = {
+        'revenue_df': revenue_df,
+        'item_df': item_df[item_df['Month'].isin(window_months)],
+        'warehouse_df': frames['warehouse_df'][frames['warehouse_df']['Month'].isin(window_months)],
+        'top_items_df': top_items,
+    }
+    return {
+        **snapshot,
+        'version': f"{snapshot['version']}.{start}-{end}",
+        'window': (window_months[0], window_months[-1]),
+        'bundle': bundle,
+        'frames': {**frames, **window_frames},
+        'frames_bytes': sum(frame_bytes(frame) for frame in window_frames.values()),
     }
-    all_warehouse_data = []
-    for month, info in warehouse_files.items():
-        full_path = os.path.join(data_dir, info['file'])
-        sheet_name = info['sheet']
-        if not os.path.exists(full_path):
-            print(f"[ERROR] File NOT FOUND: {full_path}")
-            continue
-        try:
-            df = pd.read_excel(full_path, sheet_name=sheet_name)
-            df = clean_data(df)
-            df['Month'] = month
-            all_warehouse_data.append(df)
-            print(f"[SUCCESS] Processed: {info['file']} (Sheet: {sheet_name})")
-        except Exception as e:
-            print(f"[ERROR] Failed to process warehouse file {full_path} (Sheet: {sheet_name}): {e}")
-    
-    if not all_warehouse_data:
-        raise FileNotFoundError(f"No 'Warehouse' (data 2) data was loaded. Check files in '{data_dir}'.")
-    
-    warehouse_df = pd.concat(all_warehouse_data, ignore_index=True)
 
-    # --- 4. Inventory Analysis Function Call ---
-    inventory_table_data, inventory_chart_data, low_stock_alerts = get_inventory_analysis(data_dir, item_df)
+def format_dashboard_bundle(revenue_df, latest_month, top_items, item_sales, category_revenue, inventory):
+    """
+    Turns the aggregated frames into the dashboard bundle: KPIs, chart data
+    and the inventory (table, chart, alerts) triple.
+    """
+    inventory_table_data, inventory_chart_data, low_stock_alerts = inventory
 
-    # --- 5. Format for Dashboard ---
-    latest_revenue_series = revenue_df[revenue_df['Month'] == 'October']['Total_Revenue']
+    latest_revenue_series = revenue_df[revenue_df['Month'] == latest_month]['Total_Revenue']
     latest_revenue = latest_revenue_series.values[0] if not latest_revenue_series.empty else 0
     total_revenue = revenue_df['Total_Revenue'].sum()
     
-    best_selling_item_series = item_df.groupby('Item Name')['Count'].sum()
+    best_selling_item_series = item_sales
     best_selling_item_name = best_selling_item_series.idxmax()
     best_selling_item_count = best_selling_item_series.max()
     
     try:
-        top_warehouse_series = warehouse_df.groupby('Category')['Amount'].sum()
+        top_warehouse_series = category_revenue
         top_warehouse_name = top_warehouse_series.idxmax()
         top_warehouse_revenue = top_warehouse_series.max()
     except Exception as e:
-        print(f"[ERROR] Could not calculate Top Warehouse KPI: {e}")
+        log_event(log, logging.ERROR, "kpi_failed", kpi="top_warehouse", error=str(e))
         top_warehouse_name = "Error"
         top_warehouse_revenue = 0
 
@@ -386,7 +807,6 @@ def get_dashboard_data():
     
     top_items_json = top_items.to_json(orient='records')
 
-    # --- 6. Return ALL data (including low_stock_alerts) ---
     return {
         "latest_month_revenue": latest_revenue,
         "total_6_month_revenue": total_revenue,
@@ -404,4 +824,163 @@ def get_dashboard_data():
         "worst_selling_item_count": worst_selling_item_count,
         "donut_chart_data": donut_chart_data,
         "low_stock_alerts": low_stock_alerts  # NEW
-    }
\ No newline at end of file
+    }
+
+def load_dashboard_tables(data_dir, month_files):
+    """
+    pandas backend: parses the month workbooks (reusing unchanged ones)
+    and merges their partials in the running AggregateStore.
+    """
+    month_order = list(month_files)
+    with stage_timer("ingest"):
+        loaded = ingest_months(month_files, data_dir)
+    all_items = [sheets['items'].assign(Month=month) for month, sheets in loaded.items() if 'items' in sheets]
+    all_warehouse_data = [sheets['warehouse'].assign(Month=month) for month, sheets in loaded.items() if 'warehouse' in sheets]
+
+    # Running totals only re-aggregate months whose file changed
+    store = get_aggregate_store(data_dir)
+    month_keys = {month: get_file_key(os.path.join(data_dir, month_files[month])) for month in loaded}
+    with stage_timer("aggregate"):
+        ingested = store.sync(loaded, month_keys)
+    ROWS_PROCESSED.inc(sum(len(loaded[month].get('items', ())) for month in ingested), stage="aggregate")
+
+    # --- 2. Monthly Revenue Analysis (data 1) ---
+    monthly_revenue = store.monthly_revenue(month_order)
+    if not monthly_revenue:
+        raise FileNotFoundError(f"No 'Group' data was loaded. Check files in '{data_dir}'.")
+    revenue_df = pd.DataFrame(monthly_revenue)
+    revenue_df['Month'] = pd.Categorical(revenue_df['Month'], categories=month_order, ordered=True)
+    revenue_df = revenue_df.sort_values('Month')
+
+    # --- 3. Top Items Analysis (data 3) ---
+    if not all_items:
+        raise FileNotFoundError(f"No 'Item' (data 3) data was loaded. Check files in '{data_dir}'.")
+    
+    item_df = compact_frame(pd.concat(all_items, ignore_index=True), month_order)
+    top_items = store.top_items()
+
+    # --- Warehouse data (data 2) ---
+    if not all_warehouse_data:
+        raise FileNotFoundError(f"No 'Warehouse' (data 2) data was loaded. Check files in '{data_dir}'.")
+    
+    warehouse_df = compact_frame(pd.concat(all_warehouse_data, ignore_index=True), month_order)
+
+    # --- 4. Inventory Analysis Function Call ---
+    inventory = get_inventory_analysis(data_dir, item_df, n_months=len(all_items))
+
+    return {
+        "revenue_df": revenue_df,
+        "item_df": item_df,
+        "warehouse_df": warehouse_df,
+        "top_items": top_items,
+        "item_sales": store.item_sales(),
+        "category_revenue": store.category_revenue(),
+        "inventory": inventory,
+    }
+
+def load_sql_dashboard_tables(data_dir, month_files):
+    """
+    sqlite backend: loads new or changed files into the analytical store in
+    one transaction, then answers every aggregate with SQL GROUP BY.
+    Unchanged workbooks are never parsed again, not even after a restart.
+    """
+    month_order = list(month_files)
+    store = get_analytics_store(data_dir, get_default_data_dir())
+    labels = {file_name: month for month, file_name in month_files.items()}
+    month_keys = {file_name: get_file_key(os.path.join(data_dir, file_name)) for file_name in labels}
+    csv_keys = {file_name: get_file_key(os.path.join(data_dir, file_name))
+                for file_name in (INGREDIENT_FILE, SHIPMENT_FILE) if os.path.exists(os.path.join(data_dir, file_name))}
+    stale = set(store.stale_files({**month_keys, **csv_keys}))
+
+    with stage_timer("ingest"):
+        stale_months = {labels[name]: name for name in labels if name in stale}
+        loaded = ingest_months(stale_months, data_dir, cache=False) if stale_months else {}
+        recipes = shipments = None
+        if INGREDIENT_FILE in stale:
+            recipes = (csv_keys[INGREDIENT_FILE], recipe_rows(get_bill_of_materials(data_dir)))
+        if SHIPMENT_FILE in stale:
+            shipment_df = read_csv_snapshot(os.path.join(data_dir, SHIPMENT_FILE))
+            shipments = (csv_keys[SHIPMENT_FILE], shipment_rows(shipment_df))
+    with stage_timer("aggregate"):
+        store.sync(month_keys, labels, {month_files[month]: sheets for month, sheets in loaded.items()},
+                   recipes, shipments)
+    ROWS_PROCESSED.inc(sum(len(sheets.get('items', ())) for sheets in loaded.values()), stage="aggregate")
+
+    with stage_timer("query"):
+        revenue_df = store.monthly_revenue(month_order)
+        if revenue_df.empty:
+            raise FileNotFoundError(f"No 'Group' data was loaded. Check files in '{data_dir}'.")
+        top_items = store.top_items()
+        if top_items.empty:
+            raise FileNotFoundError(f"No 'Item' (data 3) data was loaded. Check files in '{data_dir}'.")
+        category_revenue = store.category_revenue()
+        if category_revenue.empty:
+            raise FileNotFoundError(f"No 'Warehouse' (data 2) data was loaded. Check files in '{data_dir}'.")
+        item_df = compact_frame(store.item_month_rows(), month_order)
+        warehouse_df = compact_frame(store.category_month_rows(), month_order)
+        usage = store.ingredient_usage()
+        shipment_df = store.shipments()
+
+    inventory = "{}", "{}", []
+    if not shipment_df.empty:
+        with stage_timer("inventory"):
+            bom = get_bill_of_materials(data_dir)
+            n_months = item_df['Month'].nunique()
+            avg_ingredient_usage = usage.reindex(bom.ingredients, fill_value=0).to_numpy() / n_months
+            inventory = analyze_inventory(bom, shipment_df, avg_ingredient_usage)
+
+    return {
+        "revenue_df": revenue_df,
+        "item_df": item_df,
+        "warehouse_df": warehouse_df,
+        "top_items": top_items,
+        "item_sales": top_items.set_index('Item Name')['Count'].sort_index(),
+        "category_revenue": category_revenue,
+        "inventory": inventory,
+    }
+
+def build_dashboard_data(data_dir):
+    """
+    Reads all XLSX files from the data/ folder and returns key metrics
+    for the Flask dashboard, plus the intermediate frames they came from.
+    """
+    log_event(log, logging.INFO, "dashboard_build_started", data_dir=data_dir, backend=ANALYSIS_BACKEND)
+
+    # --- 1. Load Every Month Workbook (data 1, data 2, data 3) ---
+    month_files = build_month_index(data_dir)
+    month_order = list(month_files)
+    if not month_files:
+        raise FileNotFoundError(f"No '*_Data_Matrix.xlsx' files were found in '{data_dir}'.")
+
+    # --- 2-4. Revenue, items, warehouse and inventory from the chosen backend ---
+    if ANALYSIS_BACKEND not in ANALYSIS_BACKENDS:
+        raise ValueError(f"Unknown analysis backend '{ANALYSIS_BACKEND}', expected one of {ANALYSIS_BACKENDS}")
+    if ANALYSIS_BACKEND == 'sqlite':
+        tables = load_sql_dashboard_tables(data_dir, month_files)
+    else:
+        tables = load_dashboard_tables(data_dir, month_files)
+    revenue_df, item_df, warehouse_df, top_items = (
+        tables['revenue_df'], tables['item_df'], tables['warehouse_df'], tables['top_items'])
+
+    # --- 5. Format for Dashboard ---
+    bundle = format_dashboard_bundle(
+        revenue_df, month_order[-1], top_items, tables['item_sales'], tables['category_revenue'], tables['inventory'])
+
+    # Prefix sums over months answer ?start=&end= windows without a rebuild
+    try:
+        bom = get_bill_of_materials(data_dir)
+    except Exception as e:
+        log_event(log, logging.WARNING, "cubes_without_usage", error=str(e))
+        bom = None
+    with stage_timer("cubes"):
+        cubes = build_month_cubes(month_order, item_df, warehouse_df, bom)
+
+    # --- 6. Return ALL data (including low_stock_alerts) ---
+    frames = {
+        "revenue_df": revenue_df,
+        "item_df": item_df,
+        "warehouse_df": warehouse_df,
+        "top_items_df": top_items,
+        "cubes": cubes,
+    }
+    return bundle, frames
@@ -0,0 +1,393 @@
+# Versioned JSON API for the dashboard data
+#
+# Payloads are serialized (and compressed) once per snapshot version and served
+# with strong ETags, so repeat loads are answered with 304 Not Modified.
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Response, abort, current_app, request
+
+from .analysis import (get_bill_of_materials, get_cache_stats, get_chain_summaries, get_current_snapshot,
+                       get_location_status, get_memory_report, get_shipment_usage, get_stock_projection,
+                       get_window_bounds)
+from .datatables import TableIndex, datatables_response
+from .drilldown import category_drilldown, item_drilldown
+from .forecasting import get_demand_forecast, get_revenue_forecast
+from .locations import merge_ingredient_usage, merge_revenue, rollup_version
+from .metrics import record_cache, stage_timer
+from .projection import DAYS_PER_MONTH, LOW_STOCK_BUFFER, PROJECTION_DAYS
+from .scenarios import current_plan, evaluate_scenarios
+from .views import get_request_location_dir, get_request_snapshot
+
+try:
+    import brotli
+except ImportError:  # gzip is always available
+    brotli = None
+
+api = Blueprint("api", __name__)
+
+PAYLOAD_CACHE_SIZE = 64
+MIN_COMPRESS_BYTES = 512
+
+TABLE_INDEX_CACHE_SIZE = 8
+MAX_PROJECTION_DAYS = 3 * 365
+
+_payload_lock = threading.Lock()
+_payload_cache = OrderedDict()
+_table_indexes = OrderedDict()
+
+def to_jsonable(obj):
+    """json.dumps default= hook for numpy/pandas/datetime values."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return json.loads(obj.to_json(orient='records'))
+    if isinstance(obj, (datetime, pd.Timestamp)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def get_payload(key, version, build):
+    """
+    Returns {encoding: body bytes} for one endpoint/query at one snapshot
+    version, calling build() and compressing only on the first request.
+    """
+    cache_key = (key, version)
+    with _payload_lock:
+        payload = _payload_cache.get(cache_key)
+        if payload is not None:
+            _payload_cache.move_to_end(cache_key)
+    record_cache("api_payload", payload is not None)
+    if payload is not None:
+        return payload
+
+    with stage_timer("serialize"):
+        body = json.dumps({"version": version, "data": build()}, default=to_jsonable).encode()
+    payload = {"identity": body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        payload["gzip"] = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            payload["br"] = brotli.compress(body)
+
+    with _payload_lock:
+        _payload_cache[cache_key] = payload
+        while len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+            _payload_cache.popitem(last=False)
+    return payload
+
+def choose_encoding(payload):
+    """Best encoding the client accepts that we have a body for."""
+    for encoding in ("br", "gzip"):
+        if encoding in payload and request.accept_encodings[encoding]:
+            return encoding
+    return "identity"
+
+def json_response(name, build, snapshot=None, query_key=()):
+    """
+    Serves a cached payload with a strong ETag derived from the snapshot
+    version and honours If-None-Match with 304 Not Modified.
+    """
+    snapshot = snapshot or get_current_snapshot()
+    version = snapshot['version']
+    payload = get_payload((name,) + tuple(query_key), version, build)
+    encoding = choose_encoding(payload)
+
+    # Strong validators must differ per content-coding
+    etag = f"{version}-{name}"
+    if query_key:
+        etag += "-" + hashlib.sha1(repr(tuple(query_key)).encode()).hexdigest()[:8]
+    if encoding != "identity":
+        etag += f"-{encoding}"
+
+    response = Response(payload[encoding], mimetype="application/json")
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def get_table_index(name, snapshot, build_frame):
+    """TableIndex for one table of a snapshot, built on first use."""
+    key = (name, snapshot['version'])
+    with _payload_lock:
+        index = _table_indexes.get(key)
+        if index is not None:
+            _table_indexes.move_to_end(key)
+    record_cache("table_index", index is not None)
+    if index is not None:
+        return index
+    index = TableIndex(build_frame())
+    with _payload_lock:
+        _table_indexes[key] = index
+        while len(_table_indexes) > TABLE_INDEX_CACHE_SIZE:
+            _table_indexes.popitem(last=False)
+    return index
+
+# --- Endpoints ---
+# Every endpoint accepts the dashboard's ?start=&end= (or ?last=N) month window
+# and ?location=<store> (the default location if absent).
+
+@api.route("/revenue")
+def revenue():
+    snapshot = get_request_snapshot()
+    bundle = snapshot['bundle']
+    model = current_app.config["FORECAST_MODEL"]
+    interval = current_app.config["FORECAST_INTERVAL"]
+
+    def build():
+        monthly_df = bundle['monthly_revenue_df']
+        forecast = get_revenue_forecast(snapshot, model, interval)
+        return {
+            "months": monthly_df['Month'].astype(str).tolist(),
+            "revenue": monthly_df['Total_Revenue'].tolist(),
+            "latest_month_revenue": bundle['latest_month_revenue'],
+            "total_revenue": bundle['total_6_month_revenue'],
+            "forecast": {
+                "model": forecast['model'],
+                "month": forecast['chart_labels'][-1],
+                "prediction": forecast['predicted_revenue'],
+                "lower": forecast['bad_month_pred'],
+                "upper": forecast['good_month_pred'],
+            },
+        }
+    return json_response("revenue", build, snapshot, query_key=(model, interval))
+
+@api.route("/items")
+def items():
+    snapshot = get_request_snapshot()
+    bundle = snapshot['bundle']
+
+    def build():
+        return {
+            "top_items": json.loads(bundle['top_items_json']),
+            "donut_chart_data": bundle['donut_chart_data'],
+            "best_selling_item": {"name": bundle['best_selling_item_name'], "count": bundle['best_selling_item_count']},
+            "worst_selling_item": {"name": bundle['worst_selling_item_name'], "count": bundle['worst_selling_item_count']},
+            "highest_revenue_item": {"name": bundle['highest_revenue_item_name'], "amount": bundle['highest_revenue_item_amount']},
+            "top_warehouse": {"name": bundle['top_warehouse_name'], "revenue": bundle['top_warehouse_revenue']},
+        }
+    return json_response("items", build, snapshot)
+
+@api.route("/items/<path:name>")
+def item_detail(name):
+    """One menu item's monthly units and revenue, revenue share and implied ingredient usage."""
+    snapshot = get_request_snapshot()
+    cubes = snapshot['frames']['cubes']
+    if name not in cubes['item_count'].key_index:
+        abort(404, description=f"No sales of '{name}' were loaded")
+    start, end = get_window_bounds(snapshot)
+
+    def build():
+        # The usage cube is only built when the recipes could be read
+        bom = get_bill_of_materials(snapshot['data_dir']) if 'ingredient_usage' in cubes else None
+        return item_drilldown(cubes, name, start, end, bom)
+    return json_response("item-detail", build, snapshot, query_key=(name,))
+
+@api.route("/categories/<path:name>")
+def category_detail(name):
+    """One warehouse category's monthly revenue and revenue share."""
+    snapshot = get_request_snapshot()
+    cubes = snapshot['frames']['cubes']
+    if name not in cubes['category_revenue'].key_index:
+        abort(404, description=f"Unknown category '{name}'")
+    start, end = get_window_bounds(snapshot)
+    return json_response("category-detail", lambda: category_drilldown(cubes, name, start, end), snapshot,
+                         query_key=(name,))
+
+@api.route("/inventory")
+def inventory():
+    snapshot = get_request_snapshot()
+    bundle = snapshot['bundle']
+
+    def build():
+        return {
+            "table": json.loads(bundle['inventory_table_data']),
+            "chart": bundle['inventory_chart_data'],
+        }
+    return json_response("inventory", build, snapshot)
+
+@api.route("/inventory/projection")
+def inventory_projection():
+    """Projected end-of-day stock per shipment item for ?days=N (default MSY_PROJECTION_DAYS)."""
+    snapshot = get_request_snapshot()
+    try:
+        days = int(request.args.get("days", PROJECTION_DAYS))
+    except ValueError:
+        abort(400, description=f"'days' must be a number of days, got '{request.args['days']}'")
+    if not 1 <= days <= MAX_PROJECTION_DAYS:
+        abort(400, description=f"days must be between 1 and {MAX_PROJECTION_DAYS}")
+
+    def build():
+        projection = get_stock_projection(snapshot, days)
+        if projection is None:
+            return {"days": days, "items": []}
+        table, on_hand = projection
+        items = []
+        for row, curve in zip(table.itertuples(index=False), on_hand):
+            items.append({
+                "ingredient": row.Ingredient,
+                "unit": row.Unit,
+                "daily_usage": row.Avg_Monthly_Usage / DAYS_PER_MONTH,
+                "delivery_quantity": row.Delivery_Quantity,
+                "interval_days": None if pd.isna(row.Interval_Days) else row.Interval_Days,
+                "days_until_stockout": None if pd.isna(row.Days_Until_Stockout) else int(row.Days_Until_Stockout),
+                "on_hand": np.round(curve, 2).tolist(),
+            })
+        return {"days": days, "items": items}
+    return json_response("inventory-projection", build, snapshot, query_key=(days,))
+
+@api.route("/alerts")
+def alerts():
+    snapshot = get_request_snapshot()
+    return json_response("alerts", lambda: snapshot['bundle']['low_stock_alerts'], snapshot)
+
+@api.route("/forecast/demand")
+def demand_forecast():
+    """Next-month demand per menu item, recipe ingredient and shipment item."""
+    snapshot = get_request_snapshot()
+
+    def build():
+        forecast = get_demand_forecast(snapshot, get_bill_of_materials(snapshot['data_dir']))
+        return {
+            "month": forecast['month'],
+            "items": forecast['items'],
+            "ingredients": forecast['ingredients'],
+            "shipments": forecast['shipments'],
+        }
+    return json_response("demand-forecast", build, snapshot)
+
+@api.route("/scenarios", methods=["POST"])
+def scenarios():
+    """
+    Evaluates a batch of alternative shipment schedules against the
+    window's average usage. Body: {"scenarios": [{"name", "shipments":
+    {shipment: {"quantity", "number", "frequency"}}}], "target_buffer",
+    "unit_costs", "delivery_cost"}; see scenarios.evaluate_scenarios().
+    """
+    snapshot = get_request_snapshot()
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, description="Expected a JSON object body")
+    usage = get_shipment_usage(snapshot)
+    if usage is None:
+        abort(409, description="Recipes and shipments are not loaded")
+
+    plan = current_plan(*usage)
+    options = {
+        "target_buffer": body.get("target_buffer", LOW_STOCK_BUFFER),
+        "unit_costs": body.get("unit_costs"),
+        "delivery_cost": body.get("delivery_cost", 0.0),
+    }
+    with stage_timer("scenarios"):
+        try:
+            results, cheapest = evaluate_scenarios(plan, body.get("scenarios"), **options)
+            current, _ = evaluate_scenarios(plan, [{"name": "Current schedule"}], **options)
+        except ValueError as e:
+            abort(400, description=str(e))
+
+    data = {
+        "target_buffer": options["target_buffer"],
+        "current": json.loads(current.to_json(orient='records'))[0],
+        "scenarios": json.loads(results.to_json(orient='records')),
+        "cheapest": None if cheapest is None else {"index": cheapest, "name": results['Scenario'][cheapest]},
+    }
+    response = Response(json.dumps({"version": snapshot['version'], "data": data}, default=to_jsonable),
+                        mimetype="application/json")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@api.route("/memory")
+def memory():
+    """
+    Bytes per resident frame, cube and cached month (not windowed). Window
+    and forecast caches grow without a version change, so the report is
+    built on every request and never cached.
+    """
+    report = get_memory_report(get_request_location_dir())
+    response = Response(json.dumps({"version": report['version'], "data": report}, default=to_jsonable),
+                        mimetype="application/json")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@api.route("/tables/items")
+def items_table():
+    """
+    DataTables server-side processing for the menu items table. DataTables
+    sends the row offset as ?start=, so the month window comes in as
+    ?window_start=&window_end= (or ?last=).
+    """
+    snapshot = get_request_snapshot("window_start", "window_end")
+    columns = ['Item Name', 'Amount', 'Count', 'Avg_Price', 'Months_Data']
+    index = get_table_index("items", snapshot, lambda: snapshot['frames']['top_items_df'][columns])
+    response = Response(json.dumps(datatables_response(index, request.args), default=to_jsonable),
+                        mimetype="application/json")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+# --- Store Locations & Chain Rollups ---
+
+@api.route("/locations")
+def locations():
+    """Every store location, whether its snapshot is resident and its size against the memory budget."""
+    stats = get_cache_stats()
+    data = {
+        "locations": get_location_status(),
+        "resident_bytes": stats['resident_bytes'],
+        "budget_bytes": stats['budget_bytes'],
+        "evictions": stats['evictions'],
+    }
+    response = Response(json.dumps({"data": data}, default=to_jsonable), mimetype="application/json")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+def get_chain_rollup():
+    """(per-store summaries, rollup version) for the chain endpoints."""
+    try:
+        summaries = get_chain_summaries()
+    except FileNotFoundError as e:
+        abort(404, description=str(e))
+    return summaries, {"version": rollup_version(summaries)}
+
+@api.route("/chain/revenue")
+def chain_revenue():
+    """Monthly revenue of every store and of the whole chain, merged from per-store summaries."""
+    summaries, rollup = get_chain_rollup()
+
+    def build():
+        revenue = merge_revenue(summaries)
+        return {
+            "months": revenue.index.tolist(),
+            "chain": revenue['Chain'].tolist(),
+            "locations": {name: revenue[name].tolist() for name in summaries},
+            "total_revenue": float(revenue['Chain'].sum()),
+        }
+    return json_response("chain-revenue", build, rollup)
+
+@api.route("/chain/ingredients")
+def chain_ingredients():
+    """Chain-wide monthly ingredient usage, plus each store's total per ingredient."""
+    summaries, rollup = get_chain_rollup()
+
+    def build():
+        monthly, by_location = merge_ingredient_usage(summaries)
+        return {
+            "months": monthly.index.tolist(),
+            "ingredients": [
+                {
+                    "ingredient": ingredient,
+                    "monthly_usage": monthly[ingredient].round(2).tolist(),
+                    "total_usage": round(float(monthly[ingredient].sum()), 2),
+                    "locations": by_location.loc[ingredient].round(2).to_dict(),
+                }
+                for ingredient in monthly.columns
+            ],
+        }
+    return json_response("chain-ingredients", build, rollup)
@@ -0,0 +1,142 @@
+# Prefix-sum month cubes for date-range queries
+#
+# Per-month totals (item units and revenue, category revenue, ingredient
+# usage) are stacked into (months x keys) matrices and cumulatively summed once
+# per snapshot, so the totals for any [start, end] month window are a single
+# subtraction of two rows. Each cube also maps its keys to matrix columns, so a
+# single item's or category's monthly series is a column read.
+import numpy as np
+import pandas as pd
+
+from .schema import AMOUNT_CENTS
+
+def pivot_month_matrix(df, key_col, value_col, month_order, keys=None):
+    """
+    Pivots per-month rows into a dense (months x keys) matrix of value_col
+    sums. Returns (keys, matrix); keys default to the sorted distinct values
+    of key_col and missing months count as 0.
+    """
+    if keys is None:
+        key_codes, keys = pd.factorize(df[key_col], sort=True)
+        keys = list(keys)
+    else:
+        key_codes = pd.Categorical(df[key_col], categories=keys).codes
+    month_codes = pd.Categorical(df['Month'], categories=month_order).codes
+    values = df[value_col].to_numpy(dtype=float)
+    valid = (key_codes >= 0) & (month_codes >= 0) & ~np.isnan(values)
+
+    matrix = np.zeros((len(month_order), len(keys)))
+    np.add.at(matrix, (month_codes[valid], key_codes[valid]), values[valid])
+    return keys, matrix
+
+class MonthCube:
+    """
+    Cumulative sums over the month axis of a (months x keys) matrix.
+    prefix[k] holds the totals of the first k months and prefix_totals[k]
+    their sum over all keys; key_index maps each key to its column.
+    """
+
+    def __init__(self, months, keys, matrix):
+        self.months = list(months)
+        self.keys = list(keys)
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.prefix = np.zeros((len(self.months) + 1, len(self.keys)))
+        np.cumsum(self.matrix, axis=0, out=self.prefix[1:])
+        self._index_keys()
+
+    @classmethod
+    def from_prefix(cls, months, keys, matrix, prefix):
+        """A cube over already computed (e.g. memory-mapped) matrix and prefix arrays."""
+        cube = cls.__new__(cls)
+        cube.months = list(months)
+        cube.keys = list(keys)
+        cube.matrix = matrix
+        cube.prefix = prefix
+        cube._index_keys()
+        return cube
+
+    def _index_keys(self):
+        self.key_index = {key: j for j, key in enumerate(self.keys)}
+        self.prefix_totals = np.asarray(self.prefix).sum(axis=1)
+
+    def window_total(self, start, end):
+        """Per-key totals over month positions start..end (inclusive)."""
+        return self.prefix[end + 1] - self.prefix[start]
+
+    def window_series(self, start, end):
+        """Per-key totals as a Series indexed by key."""
+        return pd.Series(self.window_total(start, end), index=self.keys)
+
+    def key_series(self, key, start, end):
+        """One key's values for month positions start..end; KeyError if the cube doesn't hold key."""
+        return np.asarray(self.matrix[start:end + 1, self.key_index[key]])
+
+    def key_total(self, key, start, end):
+        """One key's total over month positions start..end."""
+        j = self.key_index[key]
+        return float(self.prefix[end + 1, j] - self.prefix[start, j])
+
+    def grand_total(self, start, end):
+        """Sum over every key for month positions start..end."""
+        return float(self.prefix_totals[end + 1] - self.prefix_totals[start])
+
+    def month_totals(self, start, end):
+        """Sum over every key for each month position start..end."""
+        return np.diff(self.prefix_totals[start:end + 2])
+
+def build_month_cubes(month_order, item_df, warehouse_df, bom=None):
+    """
+    Builds the cubes a snapshot answers window queries from:
+    'item_count', 'item_amount', 'item_months' (months with data),
+    'category_revenue' and, given a bill of materials, 'ingredient_usage'.
+    item_df and warehouse_df are in the schema.compact_frame() layout.
+    """
+    item_names, item_counts = pivot_month_matrix(item_df, 'Item Name', 'Count', month_order)
+    _, item_cents = pivot_month_matrix(item_df, 'Item Name', AMOUNT_CENTS, month_order, item_names)
+    _, item_rows = pivot_month_matrix(item_df.assign(Rows=1), 'Item Name', 'Rows', month_order, item_names)
+    categories, category_cents = pivot_month_matrix(warehouse_df, 'Category', AMOUNT_CENTS, month_order)
+    item_amounts, category_amounts = item_cents / 100, category_cents / 100
+
+    cubes = {
+        'item_count': MonthCube(month_order, item_names, item_counts),
+        'item_amount': MonthCube(month_order, item_names, item_amounts),
+        'item_months': MonthCube(month_order, item_names, item_rows > 0),
+        'category_revenue': MonthCube(month_order, categories, category_amounts),
+    }
+    if bom is not None:
+        usage = bom.ingredient_usage(bom.sales_matrix(item_names, item_counts))
+        cubes['ingredient_usage'] = MonthCube(month_order, bom.ingredients, usage)
+    return cubes
+
+def resolve_window(months, start=None, end=None, last=None):
+    """
+    Turns window query parameters into inclusive month positions. start and
+    end are month labels ('June' or 'June 2025', case-insensitive); last=N
+    means the latest N months. Returns None when no window was asked for and
+    raises ValueError for unknown months or an empty window.
+    """
+    if not start and not end and not last:
+        return None
+    lookup = {month.lower(): i for i, month in enumerate(months)}
+
+    def position(label):
+        i = lookup.get(label.strip().lower())
+        if i is None:
+            raise ValueError(f"Unknown month '{label}', expected one of {months}")
+        return i
+
+    if last:
+        try:
+            n = int(last)
+        except ValueError:
+            raise ValueError(f"'last' must be a number of months, got '{last}'")
+        if n < 1:
+            raise ValueError("'last' must be at least 1")
+        end_pos = position(end) if end else len(months) - 1
+        start_pos = max(end_pos - n + 1, 0)
+    else:
+        start_pos = position(start) if start else 0
+        end_pos = position(end) if end else len(months) - 1
+    if start_pos > end_pos:
+        raise ValueError(f"Window start '{months[start_pos]}' is after its end '{months[end_pos]}'")
+    return start_pos, end_pos
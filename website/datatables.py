@@ -0,0 +1,143 @@
+# Server-side processing for jQuery DataTables
+#
+# A TableIndex is built once per snapshot: per-column sort orders and a
+# lowercase search column are precomputed, so a request only slices arrays
+# and serializes one page of rows.
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_SIZE = 128
+MAX_PAGE_LENGTH = 500
+
+class TableIndex:
+    """Pre-sorted, searchable view over one DataFrame."""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.columns = list(self.df.columns)
+        self.size = len(self.df)
+
+        # Ascending order and dense rank per column; descending is the reverse order
+        self.orders = {}
+        self.ranks = {}
+        for col in self.columns:
+            values = self.df[col]
+            if values.dtype == object:
+                values = values.astype(str).str.lower()
+            values = values.to_numpy()
+            order = np.argsort(values, kind='stable')
+            # Equal values share a rank so multi-column sorts can break ties
+            sorted_values = values[order]
+            is_new_value = np.ones(self.size, dtype=bool)
+            is_new_value[1:] = sorted_values[1:] != sorted_values[:-1]
+            rank = np.empty(self.size, dtype=np.int64)
+            rank[order] = np.cumsum(is_new_value) - 1
+            self.orders[col] = order
+            self.ranks[col] = rank
+
+        text = self.df.astype(str).apply(lambda col: col.str.lower())
+        self.search_text = text.agg(' '.join, axis=1).to_numpy() if self.size else np.array([], dtype=object)
+
+        self._lock = threading.Lock()
+        self._sort_cache = OrderedDict()
+        self._search_cache = OrderedDict()
+
+    def _cached(self, cache, key, compute):
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = compute()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        return value
+
+    def sort_order(self, sort_spec):
+        """
+        Row order for [(column, ascending), ...]. Single-column sorts use the
+        precomputed order; multi-column sorts lexsort the column ranks.
+        """
+        sort_spec = tuple((col, asc) for col, asc in sort_spec if col in self.orders)
+        if not sort_spec:
+            return np.arange(self.size)
+        if len(sort_spec) == 1:
+            col, asc = sort_spec[0]
+            return self.orders[col] if asc else self.orders[col][::-1]
+
+        def compute():
+            # np.lexsort sorts by the last key first
+            keys = [self.ranks[col] if asc else -self.ranks[col] for col, asc in reversed(sort_spec)]
+            return np.lexsort(keys)
+        return self._cached(self._sort_cache, sort_spec, compute)
+
+    def search_mask(self, term):
+        """Boolean mask of rows containing term (case-insensitive), or None."""
+        term = (term or '').strip().lower()
+        if not term:
+            return None
+        return self._cached(self._search_cache, term,
+                            lambda: np.fromiter((term in row for row in self.search_text), bool, self.size))
+
+    def query(self, start=0, length=10, sort_spec=(), search=''):
+        """Returns (records filtered, page DataFrame)."""
+        order = self.sort_order(sort_spec)
+        mask = self.search_mask(search)
+        if mask is not None:
+            order = order[mask[order]]
+        if length < 0:
+            length = MAX_PAGE_LENGTH
+        length = min(length, MAX_PAGE_LENGTH)
+        page = order[start:start + length]
+        return len(order), self.df.iloc[page]
+
+def parse_request_args(args):
+    """
+    Reads the DataTables server-side request parameters (draw, start,
+    length, search[value], order[i][column/dir], columns[i][data]).
+    """
+    columns = []
+    i = 0
+    while f"columns[{i}][data]" in args:
+        columns.append(args.get(f"columns[{i}][data]"))
+        i += 1
+
+    sort_spec = []
+    i = 0
+    while f"order[{i}][column]" in args:
+        try:
+            col = columns[int(args.get(f"order[{i}][column]"))]
+        except (ValueError, IndexError):
+            col = None
+        if col:
+            sort_spec.append((col, args.get(f"order[{i}][dir]", "asc") != "desc"))
+        i += 1
+
+    def to_int(name, default):
+        try:
+            return int(args.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    return {
+        "draw": to_int("draw", 0),
+        "start": max(to_int("start", 0), 0),
+        "length": to_int("length", 10),
+        "search": args.get("search[value]", ""),
+        "sort_spec": sort_spec,
+    }
+
+def datatables_response(index, args):
+    """Builds the DataTables server-side JSON reply for a request's args."""
+    params = parse_request_args(args)
+    records_filtered, page = index.query(params["start"], params["length"], params["sort_spec"], params["search"])
+    return {
+        "draw": params["draw"],
+        "recordsTotal": index.size,
+        "recordsFiltered": records_filtered,
+        "data": json.loads(page.to_json(orient='records')),
+    }
@@ -0,0 +1,103 @@
+# Finds the monthly Data_Matrix exports in a data directory
+#
+# File names look like "May_Data_Matrix.xlsx", "May_2024_Data_Matrix.xlsx" or
+# "October_Data_Matrix_20251103_214000.xlsx" (export timestamp appended).
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+MONTH_FILE_PATTERN = re.compile(
+    r'^(?P<month>[A-Za-z]+)(?:[_ -](?P<year>\d{4}))?_Data_Matrix'
+    r'(?:_(?P<stamp>\d{8}_\d{6}))?\.xlsx$',
+    re.IGNORECASE,
+)
+
+MonthFile = namedtuple('MonthFile', ['year', 'month', 'file_name', 'exported_at'])
+
+def parse_month_name(name):
+    """Returns the month number for 'October' or 'Oct', or None."""
+    for fmt in ('%B', '%b'):
+        try:
+            return datetime.strptime(name, fmt).month
+        except ValueError:
+            pass
+    return None
+
+def parse_month_file(file_name, mtime=None):
+    """
+    Parses a Data_Matrix file name into a MonthFile. The year may be None
+    when neither the name nor an export timestamp gives it. Returns None
+    for files that are not month exports.
+    """
+    match = MONTH_FILE_PATTERN.match(file_name)
+    if not match:
+        return None
+    month = parse_month_name(match.group('month'))
+    if month is None:
+        return None
+
+    exported_at = None
+    if match.group('stamp'):
+        exported_at = datetime.strptime(match.group('stamp'), '%Y%m%d_%H%M%S')
+    elif mtime is not None:
+        exported_at = datetime.fromtimestamp(mtime)
+
+    year = int(match.group('year')) if match.group('year') else None
+    if year is None and match.group('stamp'):
+        # An export is taken after its month ends, e.g. October data on Nov 3rd
+        year = exported_at.year if month <= exported_at.month else exported_at.year - 1
+    return MonthFile(year, month, file_name, exported_at)
+
+def discover_month_files(data_dir):
+    """
+    Scans data_dir once and returns the month exports as a list of
+    MonthFile sorted chronologically, keeping only the newest export of
+    each month. Files without a year are given the latest year seen
+    (or the current year if none is known).
+    """
+    month_files = []
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            if entry.is_file():
+                month_file = parse_month_file(entry.name, entry.stat().st_mtime)
+                if month_file is not None:
+                    month_files.append(month_file)
+
+    known_years = [m.year for m in month_files if m.year is not None]
+    default_year = max(known_years) if known_years else datetime.now().year
+
+    newest = {}
+    for month_file in month_files:
+        if month_file.year is None:
+            month_file = month_file._replace(year=default_year)
+        key = (month_file.year, month_file.month)
+        current = newest.get(key)
+        if current is None or (month_file.exported_at or datetime.min) > (current.exported_at or datetime.min):
+            newest[key] = month_file
+
+    return [newest[key] for key in sorted(newest)]
+
+def format_month_label(year, month, include_year):
+    """'October' or 'October 2025' for a (year, month) pair."""
+    name = datetime(year, month, 1).strftime('%B')
+    return f"{name} {year}" if include_year else name
+
+def get_month_label(month_file, include_year):
+    """'October' or 'October 2025' for a MonthFile."""
+    return format_month_label(month_file.year, month_file.month, include_year)
+
+def build_month_index(data_dir):
+    """
+    Returns {month label: file name} in chronological order. Labels are
+    plain month names unless the data spans more than one year.
+    """
+    month_files = discover_month_files(data_dir)
+    include_year = len({m.year for m in month_files}) > 1
+    return {get_month_label(m, include_year): m.file_name for m in month_files}
+
+def build_month_keys(data_dir):
+    """{month label: (year, month)} for the labels build_month_index() gives."""
+    month_files = discover_month_files(data_dir)
+    include_year = len({m.year for m in month_files}) > 1
+    return {get_month_label(m, include_year): (m.year, m.month) for m in month_files}
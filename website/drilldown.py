@@ -0,0 +1,75 @@
+# Item and category drill-downs answered from the snapshot's month cubes
+#
+# An item (or warehouse category) is found through the cube's key index and
+# its monthly values are one column of the months x keys matrix, so a
+# drill-down costs O(months) however many items the menu has. Shares of
+# revenue come from the cubes' all-key prefix totals, and the implied
+# ingredient usage from the item's recipe row in the bill of materials.
+import numpy as np
+
+def share(part, whole):
+    """part / whole, elementwise for arrays, 0 where whole is 0."""
+    part = np.asarray(part, dtype=float)
+    whole = np.asarray(whole, dtype=float)
+    return np.divide(part, whole, out=np.zeros(np.broadcast(part, whole).shape), where=whole != 0)
+
+def item_drilldown(cubes, item, start, end, bom=None):
+    """
+    Monthly units and revenue of one menu item over month positions
+    start..end, its share of item revenue (per month and overall) and the
+    recipe ingredients its sales imply. Raises KeyError for items with no
+    sales rows.
+    """
+    count_cube, amount_cube = cubes['item_count'], cubes['item_amount']
+    units = count_cube.key_series(item, start, end)
+    revenue = amount_cube.key_series(item, start, end)
+    total_units = count_cube.key_total(item, start, end)
+    total_revenue = amount_cube.key_total(item, start, end)
+
+    ingredients = []
+    has_recipe = bom is not None and item in bom.item_index
+    if has_recipe:
+        usage_cube = cubes.get('ingredient_usage')
+        for ingredient, quantity in bom.item_ingredients(item).items():
+            ingredient_total = 0.0
+            if usage_cube is not None and ingredient in usage_cube.key_index:
+                ingredient_total = usage_cube.key_total(ingredient, start, end)
+            ingredients.append({
+                "ingredient": ingredient,
+                "unit": bom.units[ingredient],
+                "per_item": quantity,
+                "monthly_usage": np.round(units * quantity, 2).tolist(),
+                "total_usage": round(total_units * quantity, 2),
+                "share_of_usage": round(float(share(total_units * quantity, ingredient_total)), 4),
+            })
+
+    return {
+        "item": item,
+        "months": count_cube.months[start:end + 1],
+        "units": np.round(units, 2).tolist(),
+        "revenue": np.round(revenue, 2).tolist(),
+        "monthly_revenue_share": np.round(share(revenue, amount_cube.month_totals(start, end)), 4).tolist(),
+        "total_units": round(total_units, 2),
+        "total_revenue": round(total_revenue, 2),
+        "revenue_share": round(float(share(total_revenue, amount_cube.grand_total(start, end))), 4),
+        "has_recipe": has_recipe,
+        "ingredients": ingredients,
+    }
+
+def category_drilldown(cubes, category, start, end):
+    """
+    Monthly revenue of one warehouse category (data 2) over month positions
+    start..end and its share of category revenue. Raises KeyError for
+    unknown categories.
+    """
+    cube = cubes['category_revenue']
+    revenue = cube.key_series(category, start, end)
+    total_revenue = cube.key_total(category, start, end)
+    return {
+        "category": category,
+        "months": cube.months[start:end + 1],
+        "revenue": np.round(revenue, 2).tolist(),
+        "monthly_revenue_share": np.round(share(revenue, cube.month_totals(start, end)), 4).tolist(),
+        "total_revenue": round(total_revenue, 2),
+        "revenue_share": round(float(share(total_revenue, cube.grand_total(start, end))), 4),
+    }
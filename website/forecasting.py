@@ -0,0 +1,249 @@
+# Revenue forecasting for the dashboard charts
+#
+# Forecasts are computed once per data snapshot and model, then reused by
+# every view until the data changes.
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .cubes import pivot_month_matrix
+from .metrics import record_cache, stage_timer
+from .schema import frame_bytes
+
+DEFAULT_MODEL = "linear"
+DEFAULT_INTERVAL = 0.8
+SEASON_LENGTH = 12
+FORECAST_CACHE_SIZE = 32
+
+_forecast_lock = threading.Lock()
+_forecast_cache = OrderedDict()
+
+def get_next_month(last_month_str):
+    """Helper to get the next month's 3-letter abbreviation ('Nov' or 'Nov 2025')"""
+    try:
+        # Month labels include the year once the data spans several years
+        if ' ' in last_month_str:
+            last_month = datetime.strptime(last_month_str, '%B %Y')
+            label_format = '%b %Y'
+        else:
+            last_month = datetime.strptime(last_month_str, '%B')
+            label_format = '%b'
+        # Get the next month's number
+        next_year = last_month.year + (last_month.month // 12)
+        next_month_num = last_month.month % 12 + 1
+        # Get the 3-letter name for the next month
+        return datetime(next_year, next_month_num, 1).strftime(label_format)
+    except:
+        return "Nov" # Fallback
+
+# --- Models ---
+# Each model takes the revenue history and the interval level and returns
+# (prediction, lower, upper) for the next month.
+
+def forecast_linear(y, interval):
+    """
+    Straight-line fit. The band is +/- one residual standard deviation, as
+    the dashboard has always shown for its best/worst month lines.
+    """
+    x = np.array(range(len(y)))
+    model = np.polyfit(x, y, 1)
+    predict = np.poly1d(model)
+    std_error = np.std(y - predict(x))
+    prediction = predict(len(x))
+    return prediction, prediction - std_error, prediction + std_error
+
+def forecast_holt(y, interval):
+    """
+    Holt's linear-trend exponential smoothing, with alpha/beta picked by a
+    grid search on one-step-ahead squared error. The band is a normal
+    prediction interval from the one-step residuals.
+    """
+    if len(y) < 3:
+        return forecast_seasonal_naive(y, interval)
+
+    best = None
+    grid = np.linspace(0.1, 0.9, 9)
+    for alpha in grid:
+        for beta in grid:
+            # Starting from the first two points fits y[1] exactly, so its
+            # residual (always 0) is left out of the error and the band
+            level, trend = y[1], y[1] - y[0]
+            errors = []
+            for value in y[2:]:
+                errors.append(value - (level + trend))
+                previous_level = level
+                level = alpha * value + (1 - alpha) * (level + trend)
+                trend = beta * (level - previous_level) + (1 - beta) * trend
+            sse = float(np.sum(np.square(errors)))
+            if best is None or sse < best[0]:
+                best = (sse, level + trend, len(errors))
+
+    sse, prediction, n_errors = best
+    sigma = np.sqrt(sse / max(n_errors - 2, 1))
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    return prediction, prediction - z * sigma, prediction + z * sigma
+
+def forecast_seasonal_naive(y, interval):
+    """
+    Next month repeats the same month last season (or the last month when
+    there is less than a season of history). The band comes from the spread
+    of past seasonal differences, or of month-to-month differences while
+    there is exactly one season and so no seasonal difference yet.
+    """
+    lag = SEASON_LENGTH if len(y) >= SEASON_LENGTH else 1
+    prediction = y[-lag]
+    differences = y[lag:] - y[:-lag]
+    if not len(differences):
+        differences = y[1:] - y[:-1]
+    sigma = np.sqrt(np.mean(np.square(differences))) if len(differences) else 0.0
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    return prediction, prediction - z * sigma, prediction + z * sigma
+
+FORECAST_MODELS = {
+    "linear": forecast_linear,
+    "holt": forecast_holt,
+    "seasonal_naive": forecast_seasonal_naive,
+}
+
+# --- Cached Chart Data ---
+
+@stage_timer("forecast")
+def build_revenue_forecast(monthly_df, model=DEFAULT_MODEL, interval=DEFAULT_INTERVAL):
+    """
+    Returns the monthly revenue chart series with the next-month forecast
+    appended: labels, values, and the prediction/good/bad month lines.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"Unknown forecast model '{model}', expected one of {sorted(FORECAST_MODELS)}")
+
+    chart_labels = monthly_df['Month'].tolist()
+    chart_values = monthly_df['Total_Revenue'].tolist()
+    predicted_revenue, bad_month_pred, good_month_pred = FORECAST_MODELS[model](np.array(chart_values), interval)
+
+    # Each forecast line starts at the last actual value so it connects
+    def forecast_line(value):
+        line = [None] * len(chart_values)
+        line[-1] = chart_values[-1]
+        line.append(value)
+        return line
+
+    return {
+        "model": model,
+        "chart_labels": chart_labels + [get_next_month(chart_labels[-1])],
+        "chart_values": chart_values,
+        "predicted_revenue": predicted_revenue,
+        "good_month_pred": good_month_pred,
+        "bad_month_pred": bad_month_pred,
+        "prediction_data": forecast_line(predicted_revenue),
+        "good_month_data": forecast_line(good_month_pred),
+        "bad_month_data": forecast_line(bad_month_pred),
+    }
+
+def cached_forecast(key, compute):
+    """Returns the memoized forecast for key, calling compute() on a miss."""
+    with _forecast_lock:
+        forecast = _forecast_cache.get(key)
+        if forecast is not None:
+            _forecast_cache.move_to_end(key)
+    record_cache("forecast", forecast is not None)
+    if forecast is not None:
+        return forecast
+    forecast = compute()
+    with _forecast_lock:
+        _forecast_cache[key] = forecast
+        while len(_forecast_cache) > FORECAST_CACHE_SIZE:
+            _forecast_cache.popitem(last=False)
+    return forecast
+
+def is_snapshot_key(key, version):
+    """True for forecasts of the snapshot version or one of its windows."""
+    return key[0] == version or key[0].startswith(f"{version}.")
+
+def forecast_bytes(version):
+    """Bytes held by the cached forecasts of a snapshot and its windows."""
+    with _forecast_lock:
+        forecasts = [forecast for key, forecast in _forecast_cache.items() if is_snapshot_key(key, version)]
+    return sum(frame_bytes(value) for forecast in forecasts for value in forecast.values()
+               if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)))
+
+def drop_forecasts(version):
+    """Forgets the cached forecasts of a snapshot and its windows."""
+    with _forecast_lock:
+        for key in [key for key in _forecast_cache if is_snapshot_key(key, version)]:
+            del _forecast_cache[key]
+
+def get_revenue_forecast(snapshot, model=DEFAULT_MODEL, interval=DEFAULT_INTERVAL):
+    """build_revenue_forecast() memoized per snapshot version and model."""
+    return cached_forecast(
+        (snapshot['version'], 'revenue', model, interval),
+        lambda: build_revenue_forecast(snapshot['bundle']['monthly_revenue_df'], model, interval),
+    )
+
+# --- Batched Item & Ingredient Demand ---
+
+def build_item_month_matrix(item_df, month_order):
+    """
+    Pivots the per-month item rows into a dense (months x items) matrix of
+    units sold. Returns (item names, matrix); missing months count as 0.
+    """
+    return pivot_month_matrix(item_df, 'Item Name', 'Count', month_order)
+
+def forecast_item_trends(matrix):
+    """
+    Fits count = intercept + slope * month for every item at once with a
+    single stacked least-squares solve, and returns (next-month forecast,
+    slopes). Forecasts are clipped at zero.
+    """
+    n_months = matrix.shape[0]
+    if n_months < 2:
+        return matrix[-1].copy() if n_months else np.zeros(matrix.shape[1]), np.zeros(matrix.shape[1])
+    design = np.column_stack([np.ones(n_months), np.arange(n_months)])
+    coefficients, *_ = np.linalg.lstsq(design, matrix, rcond=None)
+    next_month = coefficients[0] + coefficients[1] * n_months
+    return np.clip(next_month, 0, None), coefficients[1]
+
+@stage_timer("forecast")
+def build_demand_forecast(item_df, month_order, bom):
+    """
+    Projects next month's units for every menu item and pushes them through
+    the bill of materials to get next-month ingredient and shipment demand.
+    """
+    items, matrix = build_item_month_matrix(item_df, month_order)
+    item_forecast, slopes = forecast_item_trends(matrix)
+
+    sales = dict(zip(items, item_forecast))
+    ingredient_demand = bom.ingredient_usage(bom.sales_vector(sales))
+    shipment_demand = bom.shipment_usage(ingredient_demand)
+
+    return {
+        "month": get_next_month(month_order[-1]),
+        "items": pd.DataFrame({
+            "Item Name": items,
+            "Last_Month_Count": matrix[-1] if len(matrix) else 0,
+            "Forecast_Count": item_forecast,
+            "Monthly_Trend": slopes,
+        }),
+        "ingredients": pd.DataFrame({
+            "Ingredient": bom.ingredients,
+            "Unit": [bom.units[name] for name in bom.ingredients],
+            "Forecast_Usage": ingredient_demand,
+        }),
+        "shipments": pd.DataFrame({
+            "Ingredient": bom.shipment_labels,
+            "Unit": bom.shipment_units,
+            "Forecast_Usage": shipment_demand,
+        }),
+    }
+
+def get_demand_forecast(snapshot, bom):
+    """build_demand_forecast() memoized per snapshot version."""
+    frames = snapshot['frames']
+    month_order = list(frames['revenue_df']['Month'].cat.categories)
+    return cached_forecast(
+        (snapshot['version'], 'demand'),
+        lambda: build_demand_forecast(frames['item_df'], month_order, bom),
+    )
@@ -0,0 +1,157 @@
+# Store locations and chain-wide rollups
+#
+# Each store keeps its exports in its own folder, data/<store>/, laid out
+# exactly like the single-store data/ folder. Exports placed directly in
+# data/ are served as the "default" location, so single-store deployments
+# keep working unchanged. Chain rollups merge small per-store summaries
+# (monthly revenue, monthly ingredient usage) instead of re-reading every
+# store's files. Summaries are keyed by (year, month), since one store's
+# "May" may be another's "May 2025"; labels are only formatted for output.
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from .discovery import build_month_keys, discover_month_files, format_month_label, parse_month_name
+from .metrics import record_cache
+
+DEFAULT_LOCATION = "default"
+
+_locations_lock = threading.Lock()
+_locations_cache = {}
+
+def get_folders_signature(root, folders):
+    """
+    mtimes of root and of its sub-folders. Adding or removing a file or
+    folder changes its parent's mtime, so this changes whenever a rescan
+    could find different stores; None if one of them is gone.
+    """
+    try:
+        return tuple(os.stat(os.path.join(root, name)).st_mtime_ns for name in ("",) + folders)
+    except FileNotFoundError:
+        return None
+
+def list_locations(root):
+    """
+    {location: folder} for every store under root, in order: root itself as
+    DEFAULT_LOCATION when it holds month exports, then each sub-folder that
+    does (hidden folders such as .snapshots are skipped). The scan is reused
+    until root or one of its sub-folders changes, so a request costs a few
+    stat() calls instead of listing every folder.
+    """
+    with _locations_lock:
+        cached = _locations_cache.get(root)
+    fresh = cached is not None and cached[0] is not None and get_folders_signature(root, cached[1]) == cached[0]
+    record_cache("locations", fresh)
+    if fresh:
+        return dict(cached[2])
+
+    # mtimes are taken before the folders are read, so a change made during
+    # the scan still invalidates it on the next call
+    root_mtime = os.stat(root).st_mtime_ns
+    with os.scandir(root) as it:
+        folders = tuple(sorted(entry.name for entry in it if entry.is_dir() and not entry.name.startswith(".")))
+    signature = get_folders_signature(root, folders)
+    if signature is not None:
+        signature = (root_mtime,) + signature[1:]
+
+    locations = {}
+    if discover_month_files(root):
+        locations[DEFAULT_LOCATION] = root
+    for name in folders:
+        if name not in locations and discover_month_files(os.path.join(root, name)):
+            locations[name] = os.path.join(root, name)
+    with _locations_lock:
+        _locations_cache[root] = (signature, folders, locations)
+    return dict(locations)
+
+def resolve_location(root, location=None):
+    """
+    The data folder of location under root; with no location, the default
+    one (or the first store if root holds no exports itself). Raises
+    ValueError for unknown locations.
+    """
+    locations = list_locations(root)
+    if not location:
+        return next(iter(locations.values()), root)
+    data_dir = locations.get(location)
+    if data_dir is None:
+        raise ValueError(f"Unknown location '{location}', expected one of {list(locations)}")
+    return data_dir
+
+def location_name(root, data_dir):
+    """The location key a data folder is served under."""
+    if os.path.normpath(data_dir) == os.path.normpath(root):
+        return DEFAULT_LOCATION
+    return os.path.relpath(data_dir, root)
+
+# --- Chain Rollups ---
+
+def format_month_index(keys):
+    """Labels for (year, month) keys, with the year only when they span several years."""
+    include_year = len({year for year, _ in keys}) > 1
+    return [format_month_label(year, month, include_year) for year, month in keys]
+
+def summarize_snapshot(snapshot):
+    """
+    The per-store aggregates chain rollups are merged from: 'revenue'
+    (Series by (year, month)) and 'ingredient_usage' ((year, month) x
+    ingredients frame, None without recipes). Both come from frames
+    already in the snapshot.
+    """
+    month_keys = build_month_keys(snapshot['data_dir'])
+    default_year = max((year for year, _ in month_keys.values()), default=datetime.now().year)
+
+    def month_key(label):
+        # Files can change after the snapshot was built; parse labels no longer on disk
+        if label in month_keys:
+            return month_keys[label]
+        name, _, year = label.partition(' ')
+        return (int(year) if year else default_year, parse_month_name(name))
+
+    def month_index(labels):
+        return pd.MultiIndex.from_tuples([month_key(label) for label in labels], names=['Year', 'Month'])
+
+    monthly = snapshot['bundle']['monthly_revenue_df']
+    revenue = pd.Series(monthly['Total_Revenue'].to_numpy(dtype=float), index=month_index(monthly['Month'].astype(str)))
+    cube = snapshot['frames']['cubes'].get('ingredient_usage')
+    usage = None
+    if cube is not None:
+        usage = pd.DataFrame(cube.matrix, index=month_index(cube.months), columns=cube.keys)
+    return {
+        'data_dir': snapshot['data_dir'],
+        'fingerprint': snapshot['fingerprint'],
+        'version': snapshot['version'],
+        'revenue': revenue,
+        'ingredient_usage': usage,
+    }
+
+def rollup_version(summaries):
+    """Version of a rollup: changes whenever any store's snapshot does."""
+    versions = repr(sorted((name, summary['version']) for name, summary in summaries.items()))
+    return "chain-" + hashlib.sha1(versions.encode()).hexdigest()[:12]
+
+def merge_revenue(summaries):
+    """Months x locations revenue frame (0 where a store has no data) with a 'Chain' total column."""
+    revenue = pd.DataFrame({name: summary['revenue'] for name, summary in summaries.items()})
+    revenue = revenue.sort_index().fillna(0.0)
+    revenue['Chain'] = revenue.sum(axis=1)
+    revenue.index = format_month_index(revenue.index)
+    return revenue
+
+def merge_ingredient_usage(summaries):
+    """
+    Chain-wide monthly usage per ingredient (months x ingredients), summed
+    over the stores that have recipes, and each store's total per
+    ingredient (ingredients x locations).
+    """
+    usage = {name: summary['ingredient_usage'] for name, summary in summaries.items()
+             if summary['ingredient_usage'] is not None}
+    if not usage:
+        return pd.DataFrame(), pd.DataFrame()
+    monthly = pd.concat(usage.values()).groupby(level=['Year', 'Month']).sum().fillna(0.0)
+    monthly.index = format_month_index(monthly.index)
+    by_location = pd.DataFrame({name: frame.sum() for name, frame in usage.items()}).fillna(0.0)
+    return monthly, by_location.reindex(monthly.columns)
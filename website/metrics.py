@@ -0,0 +1,257 @@
+# Lightweight instrumentation: stage timers, counters and structured logs
+#
+# Metrics live in one in-process registry and are served in the Prometheus
+# text format at /metrics. Log lines go through the standard logging module
+# as "event key=value ..." (or one JSON object per line with MSY_LOG_FORMAT=json).
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, g, request, template_rendered
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOG_FORMATS = ("text", "json")
+
+_registry_lock = threading.Lock()
+_registry = []
+
+# --- Metric Types ---
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+class Metric:
+    """Base class: a named metric with fixed label names, one series per label set."""
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)] for exposition."""
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._series.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """Value that is set to the latest reading."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observations (e.g. durations in seconds)."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        samples = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, (("le", format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), count))
+        return samples
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Dashboard Metrics ---
+
+STAGE_SECONDS = Histogram(
+    "msy_stage_duration_seconds", "Time spent in each data pipeline stage.", ["stage"])
+REQUEST_SECONDS = Histogram(
+    "msy_request_duration_seconds", "HTTP request latency per route.", ["endpoint", "method", "status"])
+TEMPLATE_SECONDS = Histogram(
+    "msy_template_render_seconds", "Jinja template rendering time.", ["template"])
+FILES_PARSED = Counter(
+    "msy_files_parsed_total", "Source files parsed, by kind.", ["kind"])
+ROWS_PROCESSED = Counter(
+    "msy_rows_processed_total", "Rows loaded or aggregated, by stage.", ["stage"])
+CACHE_REQUESTS = Counter(
+    "msy_cache_requests_total", "Cache lookups, by cache and hit/miss.", ["cache", "result"])
+CACHE_HIT_RATIO = Gauge(
+    "msy_cache_hit_ratio", "Share of lookups answered from each cache.", ["cache"])
+SNAPSHOT_BUILD_SECONDS = Gauge(
+    "msy_snapshot_build_seconds", "Duration of the latest dashboard snapshot build.", ["data_dir"])
+FRAME_BYTES = Gauge(
+    "msy_frame_bytes", "Resident size of each frame of the latest dashboard snapshot.", ["data_dir", "frame"])
+SNAPSHOT_EVICTIONS = Counter(
+    "msy_snapshot_evictions_total", "Store snapshots evicted to stay within MSY_SNAPSHOT_CACHE_MB.")
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Records the time spent in a block (or, used as a decorator, a function)
+    under msy_stage_duration_seconds{stage=...}.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+def record_cache(cache, hit):
+    """Counts one lookup in cache and refreshes its hit ratio."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.value(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
+
+# --- Structured Logging ---
+
+def format_field(value):
+    """key=value rendering: strings with spaces (or empty ones) are quoted."""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, (list, tuple)):
+        value = ",".join(map(str, value))
+    value = str(value)
+    return json.dumps(value) if not value or " " in value or '"' in value else value
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Renders log_event() records as 'time LEVEL logger event key=value ...'
+    or, with fmt='json', as one JSON object per line.
+    """
+
+    def __init__(self, fmt="text"):
+        super().__init__()
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format '{fmt}', expected one of {LOG_FORMATS}")
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        timestamp = self.formatTime(record, "%Y-%m-%dT%H:%M:%S")
+        if self.fmt == "json":
+            entry = {"time": timestamp, "level": record.levelname, "logger": record.name,
+                     "event": record.getMessage(), **fields}
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        pairs = " ".join(f"{key}={format_field(value)}" for key, value in fields.items())
+        line = f"{timestamp} {record.levelname} {record.name} {record.getMessage()}"
+        if pairs:
+            line += f" {pairs}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def log_event(logger, level, event, **fields):
+    """Logs a named event with key=value fields, e.g. log_event(log, logging.INFO, "file_parsed", file=...)."""
+    logger.log(level, event, extra={"fields": fields})
+
+def configure_logging(level="INFO", fmt="text"):
+    """Sends the website.* loggers to stderr through StructuredFormatter (once)."""
+    logger = logging.getLogger("website")
+    logger.setLevel(level)
+    if not any(getattr(handler, "_msy_structured", False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler._msy_structured = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    for handler in logger.handlers:
+        if getattr(handler, "_msy_structured", False):
+            handler.setFormatter(StructuredFormatter(fmt))
+    return logger
+
+# --- Flask Wiring ---
+
+def init_app(app):
+    """Times every request per route and every template render."""
+
+    @app.before_request
+    def start_request_timer():
+        g._msy_request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("_msy_request_start", None)
+        if start is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or "unmatched",
+                                    method=request.method, status=response.status_code)
+        return response
+
+    def start_render_timer(sender, template, context, **extra):
+        g.setdefault("_msy_render_starts", []).append(time.perf_counter())
+
+    def record_render(sender, template, context, **extra):
+        starts = g.get("_msy_render_starts")
+        if starts:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - starts.pop(), template=template.name or "string")
+
+    before_render_template.connect(start_render_timer, app, weak=False)
+    template_rendered.connect(record_render, app, weak=False)
@@ -6,11 +6,71 @@ class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     data = db.Column(db.String(10000))
     date = db.Column(db.DateTime(timezone=True), default=func.now())
-    user_id = db.Column(db.Integer, db.ForeignKey("user_id"))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True)
     password = db.Column(db.String(150))
     first_name = db.Column(db.String(150))
-    notes = db.relationship("Note")
\ No newline at end of file
+    notes = db.relationship("Note")
+
+# --- Analytical Store ---
+# Loaded from the files in data/ by sqlstore.py, into its own SQLite database
+# (the "analytics" bind). Sales tables hold one row per month and key, so the
+# dashboard aggregates are plain GROUP BY queries.
+
+class DataSource(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "data_source"
+    id = db.Column(db.Integer, primary_key=True)
+    file_name = db.Column(db.String(255), nullable=False, unique=True)
+    kind = db.Column(db.String(16), nullable=False)  # 'month', 'recipes' or 'shipments'
+    label = db.Column(db.String(32))                  # month label, e.g. 'October'
+    mtime_ns = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+
+class ItemSale(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "item_sale"
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, db.ForeignKey("data_source.id"), nullable=False, index=True)
+    item_name = db.Column(db.String(255), nullable=False, index=True)
+    count = db.Column(db.Float)
+    amount = db.Column(db.Float)
+
+class CategoryRevenue(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "category_revenue"
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, db.ForeignKey("data_source.id"), nullable=False, index=True)
+    category = db.Column(db.String(255), nullable=False, index=True)
+    amount = db.Column(db.Float)
+
+class GroupRevenue(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "group_revenue"
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, db.ForeignKey("data_source.id"), nullable=False, index=True)
+    group_name = db.Column(db.String(255), nullable=False)
+    count = db.Column(db.Float)
+    amount = db.Column(db.Float)
+
+class RecipeIngredient(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "recipe_ingredient"
+    id = db.Column(db.Integer, primary_key=True)
+    item_name = db.Column(db.String(255), nullable=False, index=True)
+    ingredient = db.Column(db.String(255), nullable=False)
+    unit = db.Column(db.String(16), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+
+class ShipmentSchedule(db.Model):
+    __bind_key__ = "analytics"
+    __tablename__ = "shipment_schedule"
+    id = db.Column(db.Integer, primary_key=True)
+    ingredient = db.Column(db.String(255), nullable=False)
+    quantity_per_shipment = db.Column(db.Float)
+    unit = db.Column(db.String(32))
+    number_of_shipments = db.Column(db.Float)
+    frequency = db.Column(db.String(32))
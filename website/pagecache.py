@@ -0,0 +1,113 @@
+# Rendered page and fragment cache
+#
+# A page depends only on the snapshot it shows (window snapshots carry their
+# own version), the template, the query string and the mount point its links
+# are built for. Rendered HTML is kept under that key, so once a snapshot
+# has been viewed the next request for the same page is a dictionary lookup
+# instead of re-formatting KPIs, re-dumping chart arrays and running Jinja.
+# A new snapshot version simply stops matching; the old entries age out of
+# the LRU.
+import os
+import threading
+from collections import OrderedDict
+
+from flask import render_template, request
+from markupsafe import Markup
+
+from .metrics import record_cache
+
+PAGE_CACHE_SIZE = int(os.environ.get('MSY_PAGE_CACHE_SIZE', '256'))
+PAGE_CACHE_BYTES = int(float(os.environ.get('MSY_PAGE_CACHE_MB', '32')) * 1024 * 1024)
+FRAGMENT_CACHE_SIZE = 256
+FRAGMENT_CACHE_BYTES = 4 * 1024 * 1024
+
+class RenderCache:
+    """
+    Thread-safe LRU of rendered strings, bounded by entry count and by total
+    UTF-8 size. Values larger than the whole byte budget are not kept.
+    """
+
+    def __init__(self, name, max_entries, max_bytes):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache(self.name, entry is not None)
+        return None if entry is None else entry[0]
+
+    def put(self, key, value):
+        size = len(value.encode('utf-8'))
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+            }
+
+_page_cache = RenderCache("page", PAGE_CACHE_SIZE, PAGE_CACHE_BYTES)
+_fragment_cache = RenderCache("fragment", FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_BYTES)
+
+def snapshot_key(snapshot):
+    return (snapshot['data_dir'], snapshot['version'], request.script_root)
+
+def render_page(snapshot, template, get_context, *variant):
+    """
+    The rendered template for snapshot and the current query string,
+    rendering it with get_context() only on a miss. variant holds any other
+    setting the page depends on (e.g. the forecast model).
+    """
+    key = (template, snapshot_key(snapshot), tuple(sorted(request.args.items(multi=True))), variant)
+    page = _page_cache.get(key)
+    if page is None:
+        page = _page_cache.put(key, render_template(template, **get_context()))
+    return page
+
+def render_fragment(snapshot, template, **context):
+    """
+    A partial template rendered once per snapshot and shared by every page
+    that includes it. context must depend on nothing but the snapshot.
+    """
+    key = (template, snapshot_key(snapshot))
+    fragment = _fragment_cache.get(key)
+    if fragment is None:
+        fragment = _fragment_cache.put(key, render_template(template, **context))
+    return Markup(fragment)
+
+def get_render_cache_stats():
+    """Entry counts and sizes of the page and fragment caches."""
+    return {"pages": _page_cache.stats(), "fragments": _fragment_cache.stats()}
+
+def clear_render_cache():
+    _page_cache.clear()
+    _fragment_cache.clear()
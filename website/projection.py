@@ -0,0 +1,125 @@
+# Day-by-day stock projection and status rules for shipment items
+#
+# Every shipment item is delivered on its own cadence from Shipment.csv
+# (weekly, biweekly, monthly) and consumed at its average daily usage. The
+# projection for all items x days is one array expression: cumulative
+# deliveries minus cumulative usage, clipped at zero the way a real shelf
+# is (unmet demand is lost, not back-ordered).
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+DAYS_PER_MONTH = 365.25 / 12
+PROJECTION_DAYS = int(os.environ.get('MSY_PROJECTION_DAYS', '365'))
+
+# Deliveries per month as used for Monthly_Shipment, and days between deliveries.
+# Intervals are derived from the per-month counts so the projection delivers
+# exactly what the stock status assumes (a 'weekly' item gets 4 a month).
+SHIPMENTS_PER_MONTH = {'weekly': 4, 'biweekly': 2, 'monthly': 1}
+SHIPMENT_INTERVAL_DAYS = {frequency: DAYS_PER_MONTH / per_month for frequency, per_month in SHIPMENTS_PER_MONTH.items()}
+
+# Buffer thresholds as a share of monthly usage: < 1 week (25%) is low, > 6 weeks (150%) is surplus
+LOW_STOCK_BUFFER = 0.25
+SURPLUS_BUFFER = 1.5
+
+# (status, note) per classify_stock() rule, the last one being the default
+STOCK_RULES = [
+    ('Surplus', 'Stocked but not sold'),
+    ('Stocked', 'No sales data'),
+    ('Low Stock', 'Buffer is < 1 week of usage'),
+    ('Surplus', 'Buffer is > 6 weeks of usage'),
+    ('Stocked', 'Buffer is 1-6 weeks'),
+]
+
+def classify_stock(avg_monthly_usage, stock_delta):
+    """
+    Index into STOCK_RULES for every item, from its average monthly usage
+    and monthly buffer (shipped minus used). Inputs broadcast, so a
+    (scenarios x items) stock_delta classifies every scenario at once.
+    """
+    avg_monthly_usage = np.asarray(avg_monthly_usage, dtype=float)
+    stock_delta = np.asarray(stock_delta, dtype=float)
+    no_usage = avg_monthly_usage <= 0
+    conditions = np.broadcast_arrays(
+        no_usage & (stock_delta > 0),
+        no_usage,
+        stock_delta < avg_monthly_usage * LOW_STOCK_BUFFER,
+        stock_delta > avg_monthly_usage * SURPLUS_BUFFER,
+    )
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+
+def parse_frequency(freq):
+    """'Weekly', 'bi-weekly', 'Monthly ' ... -> a SHIPMENTS_PER_MONTH key, or None if unknown."""
+    key = re.sub(r'[^a-z]', '', str(freq).lower())
+    return key if key in SHIPMENTS_PER_MONTH else None
+
+def shipment_schedule(bom, shipment_df):
+    """
+    One row per shipment item (first Shipment.csv row wins), indexed by
+    shipment name: Delivery_Quantity (converted to bom units, all boxes of
+    one delivery), Shipments_Per_Month and Interval_Days (NaN if unknown).
+    """
+    shipment_df = shipment_df.drop_duplicates('Ingredient').set_index('Ingredient')
+    frequency = shipment_df['frequency'].map(parse_frequency)
+    conversion = shipment_df['Unit of shipment'].map(bom.unit_conversions).fillna(1)
+    return pd.DataFrame({
+        'Delivery_Quantity': shipment_df['Quantity per shipment'] * shipment_df['Number of shipments'] * conversion,
+        'Shipments_Per_Month': frequency.map(SHIPMENTS_PER_MONTH).fillna(0).astype(int),
+        'Interval_Days': frequency.map(SHIPMENT_INTERVAL_DAYS).astype(float),
+    })
+
+def project_stock(daily_usage, delivery_quantity, interval_days, horizon_days=None, initial=None):
+    """
+    Projects on-hand stock for n items over days 0..horizon_days.
+
+    Item i receives delivery_quantity[i] on day 0 and every interval_days[i]
+    after (never if NaN) and uses daily_usage[i] a day, starting from
+    initial[i] (default 0). Returns (on_hand, days_until_stockout): on_hand
+    is an (n x horizon_days + 1) array of end-of-day stock, and
+    days_until_stockout the first day demand can't be met (NaN if never
+    within the horizon).
+    """
+    horizon_days = PROJECTION_DAYS if horizon_days is None else horizon_days
+    daily_usage = np.asarray(daily_usage, dtype=float)[:, None]
+    delivery_quantity = np.asarray(delivery_quantity, dtype=float)[:, None]
+    interval = np.asarray(interval_days, dtype=float)[:, None]
+    initial = np.zeros_like(daily_usage) if initial is None else np.asarray(initial, dtype=float)[:, None]
+    days = np.arange(horizon_days + 1)
+
+    # Running balance if shortfalls were back-ordered: supply so far minus demand so far
+    scheduled = np.isfinite(interval) & (interval > 0)
+    deliveries = np.where(scheduled, np.floor(days / np.where(scheduled, interval, 1)) + 1, 0)
+    balance = initial + delivery_quantity * deliveries - daily_usage * (days + 1)
+
+    # Lost sales instead: on_hand_t = max(0, on_hand_t-1 + delivered_t - used_t), i.e. the
+    # balance lifted by its deepest shortfall so far
+    on_hand = balance - np.minimum(np.minimum.accumulate(balance, axis=1), 0)
+
+    short = balance < 0
+    days_until_stockout = np.where(short.any(axis=1), short.argmax(axis=1), np.nan)
+    return on_hand, days_until_stockout
+
+def project_shipments(bom, shipment_df, avg_shipment_usage, horizon_days=None):
+    """
+    Runs project_stock() for every bom shipment item listed in Shipment.csv,
+    given its average monthly usage (aligned with bom.shipments). Returns
+    (table, on_hand): table has Shipment_Name, Ingredient, Unit,
+    Avg_Monthly_Usage, Delivery_Quantity, Shipments_Per_Month,
+    Interval_Days and Days_Until_Stockout, one row per on_hand row.
+    """
+    schedule = shipment_schedule(bom, shipment_df)
+    table = pd.DataFrame({
+        'Shipment_Name': bom.shipments,
+        'Ingredient': bom.shipment_labels,
+        'Unit': bom.shipment_units,
+        'Avg_Monthly_Usage': avg_shipment_usage,
+    })
+    table = table[table['Shipment_Name'].isin(schedule.index)].reset_index(drop=True)
+    table = table.join(schedule, on='Shipment_Name')
+
+    on_hand, days_until_stockout = project_stock(
+        table['Avg_Monthly_Usage'] / DAYS_PER_MONTH, table['Delivery_Quantity'], table['Interval_Days'], horizon_days)
+    table['Days_Until_Stockout'] = days_until_stockout
+    return table, on_hand
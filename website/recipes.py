@@ -0,0 +1,176 @@
+# Compiled bill of materials: menu item -> recipe ingredient -> shipment item
+#
+# Recipes come from "MSY Data - Ingredient.csv". How shipment items relate to
+# recipe ingredients (aliases, composites, unit conversions) is declared in
+# bom_rules.json instead of being special-cased in the analysis code.
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from .metrics import log_event
+from .snapshots import get_file_key
+
+BOM_RULES_FILE = os.path.join(os.path.abspath(os.path.dirname(__file__)), "bom_rules.json")
+UNIT_PATTERN = re.compile(r'\s?\((g|pcs|count)\)')
+DEFAULT_UNIT = 'g'
+
+log = logging.getLogger(__name__)
+
+_bom_cache_lock = threading.Lock()
+_bom_cache = {}
+
+def parse_ingredient_header(header):
+    """'Egg(count)' -> ('Egg', 'count'). Headers without a unit are grams."""
+    match = UNIT_PATTERN.search(header)
+    if match:
+        return UNIT_PATTERN.sub('', header), match.group(1)
+    return header, DEFAULT_UNIT
+
+class BillOfMaterials:
+    """
+    Item x ingredient recipe quantities stored as a sparse (CSR) matrix,
+    plus an ingredient x shipment matrix built from the shipment rules.
+
+    Build it with BillOfMaterials.from_recipe_frame() or
+    load_bill_of_materials(); both are parsed once and reused.
+    """
+
+    def __init__(self, items, ingredients, units, dense_recipes, shipment_rules, unit_conversions):
+        self.items = list(items)
+        self.item_index = {name: i for i, name in enumerate(self.items)}
+        self.ingredients = list(ingredients)
+        self.ingredient_index = {name: j for j, name in enumerate(self.ingredients)}
+        self.units = dict(units)
+        self.unit_conversions = dict(unit_conversions)
+
+        # CSR layout: row i's entries are data[indptr[i]:indptr[i + 1]]
+        rows, cols = np.nonzero(dense_recipes)
+        self.indptr = np.searchsorted(rows, np.arange(len(self.items) + 1))
+        self.indices = cols
+        self.data = dense_recipes[rows, cols].astype(float)
+        self._rows = rows
+
+        # Shipment rules: (shipment, label, unit, [(ingredient index, factor)])
+        self.shipments = []
+        self.shipment_labels = []
+        self.shipment_units = []
+        ship_rows, ship_cols, ship_factors = [], [], []
+        for rule in shipment_rules:
+            components = [(self.ingredient_index[name], factor)
+                          for name, factor in rule['ingredients'].items()
+                          if name in self.ingredient_index]
+            if not components:
+                log_event(log, logging.WARNING, "shipment_rule_unmatched", shipment=rule['shipment'])
+                continue
+            first_ingredient = self.ingredients[components[0][0]]
+            self.shipments.append(rule['shipment'])
+            self.shipment_labels.append(rule.get('label', rule['shipment']))
+            self.shipment_units.append(rule.get('unit', self.units[first_ingredient]))
+            for ingredient_idx, factor in components:
+                ship_rows.append(ingredient_idx)
+                ship_cols.append(len(self.shipments) - 1)
+                ship_factors.append(float(factor))
+        self._ship_rows = np.array(ship_rows, dtype=int)
+        self._ship_cols = np.array(ship_cols, dtype=int)
+        self._ship_factors = np.array(ship_factors, dtype=float)
+
+    @classmethod
+    def from_recipe_frame(cls, recipe_df, rules):
+        """Compiles the raw Ingredient.csv frame with the given rules dict."""
+        recipe_df = recipe_df.rename(columns={'Item name': 'Item Name'}).set_index('Item Name')
+        ingredients, units = [], {}
+        for header in recipe_df.columns:
+            name, unit = parse_ingredient_header(header)
+            ingredients.append(name)
+            units[name] = unit
+        dense_recipes = recipe_df.fillna(0).to_numpy(dtype=float)
+        return cls(recipe_df.index, ingredients, units, dense_recipes,
+                   rules.get('shipments', []), rules.get('unit_conversions', {}))
+
+    @property
+    def nnz(self):
+        """Number of stored (non-zero) recipe quantities."""
+        return len(self.data)
+
+    def sales_vector(self, sales):
+        """
+        Aligns {item name: units sold} (dict or Series) to self.items.
+        Items without a recipe are ignored.
+        """
+        vector = np.zeros(len(self.items))
+        for name, count in sales.items():
+            i = self.item_index.get(name)
+            if i is not None:
+                vector[i] += count
+        return vector
+
+    def sales_matrix(self, item_names, matrix):
+        """
+        Aligns the columns of an (n x len(item_names)) sales matrix to
+        self.items. Items without a recipe are ignored.
+        """
+        aligned = np.zeros((len(matrix), len(self.items)))
+        for col, name in enumerate(item_names):
+            i = self.item_index.get(name)
+            if i is not None:
+                aligned[:, i] += matrix[:, col]
+        return aligned
+
+    def ingredient_usage(self, sales_vector):
+        """
+        Ingredients consumed by a sales vector (aligned with self.items), or
+        by every row of a sales matrix at once.
+        """
+        sales = np.asarray(sales_vector, dtype=float)
+        if sales.ndim == 2:
+            usage = np.zeros((len(sales), len(self.ingredients)))
+            np.add.at(usage, (slice(None), self.indices), sales[:, self._rows] * self.data)
+            return usage
+        weights = self.data * sales[self._rows]
+        return np.bincount(self.indices, weights=weights, minlength=len(self.ingredients))
+
+    def shipment_usage(self, ingredient_usage):
+        """
+        Rolls ingredient usage (a vector, or one row per period) up into
+        shipment items using the rules' factors.
+        """
+        usage = np.asarray(ingredient_usage, dtype=float)
+        if usage.ndim == 2:
+            shipped = np.zeros((len(usage), len(self.shipments)))
+            np.add.at(shipped, (slice(None), self._ship_cols), usage[:, self._ship_rows] * self._ship_factors)
+            return shipped
+        weights = usage[self._ship_rows] * self._ship_factors
+        return np.bincount(self._ship_cols, weights=weights, minlength=len(self.shipments))
+
+    def item_ingredients(self, item_name):
+        """{ingredient: quantity} for one menu item's recipe."""
+        i = self.item_index[item_name]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return {self.ingredients[j]: q for j, q in zip(self.indices[start:end], self.data[start:end])}
+
+def load_bom_rules(rules_file=None):
+    """Reads the shipment/unit rules JSON."""
+    with open(rules_file or BOM_RULES_FILE) as f:
+        return json.load(f)
+
+def load_bill_of_materials(ingredient_file, read_recipes, rules_file=None):
+    """
+    Returns the compiled BillOfMaterials for ingredient_file, reusing the
+    cached one until the CSV or the rules file changes. read_recipes(path)
+    reads the raw CSV into a DataFrame.
+    """
+    rules_file = rules_file or BOM_RULES_FILE
+    key = (ingredient_file, rules_file)
+    # mtime and size, so a rewrite within the filesystem's mtime resolution is still seen
+    signature = (get_file_key(ingredient_file), get_file_key(rules_file))
+    with _bom_cache_lock:
+        cached = _bom_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        bom = BillOfMaterials.from_recipe_frame(read_recipes(ingredient_file), load_bom_rules(rules_file))
+        _bom_cache[key] = (signature, bom)
+        return bom
@@ -0,0 +1,148 @@
+# Background refresher that rebuilds the dashboard snapshot off the request path
+#
+# Requests keep reading the last good snapshot while a new one is built, then
+# the cache swaps to the new snapshot in one step (stale-while-revalidate).
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from .analysis import get_bom_rules_file, get_dashboard_snapshot, get_data_fingerprint, set_background_refresh
+from .metrics import log_event
+
+try:
+    import inotify_simple
+except ImportError:  # polling works everywhere, inotify just reacts faster
+    inotify_simple = None
+
+log = logging.getLogger(__name__)
+
+class SnapshotRefresher:
+    """
+    Watches data_dir and its bill-of-materials rules file (inotify when
+    available, otherwise by polling the data fingerprint every `interval`
+    seconds) and rebuilds the dashboard snapshot whenever they change. A
+    failed rebuild is retried every `interval` until one succeeds.
+    on_snapshot(snapshot), if given, is called after every successful check
+    (e.g. to publish it to other processes).
+    """
+
+    def __init__(self, data_dir, interval=5.0, on_snapshot=None):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.on_snapshot = on_snapshot
+        self.watch_mode = "inotify" if inotify_simple is not None else "polling"
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {
+            "version": None,
+            "built_at": None,
+            "build_seconds": None,
+            "last_checked_at": None,
+            "last_error": None,
+            "last_error_at": None,
+            "rebuilds": 0,
+            "failures": 0,
+        }
+
+    def start(self):
+        """Builds the first snapshot in the background and starts watching."""
+        if self._thread is not None:
+            return self
+        set_background_refresh(self.data_dir, True)
+        self._thread = threading.Thread(target=self.run, name="snapshot-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stops watching; requests go back to rebuilding inline."""
+        self._stop.set()
+        set_background_refresh(self.data_dir, False)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        """Snapshot build timestamp/duration and error info, for monitoring."""
+        with self._lock:
+            status = dict(self._status)
+        status["running"] = self._thread is not None and self._thread.is_alive()
+        status["watch_mode"] = self.watch_mode
+        status["data_dir"] = self.data_dir
+        if status["built_at"] is not None:
+            status["age_seconds"] = (datetime.now() - status["built_at"]).total_seconds()
+        return status
+
+    def refresh(self):
+        """Rebuilds the snapshot now if the data changed (never raises)."""
+        with self._lock:
+            self._status["last_checked_at"] = datetime.now()
+            previous = self._status["version"]
+        try:
+            snapshot = get_dashboard_snapshot(self.data_dir)
+            if self.on_snapshot is not None:
+                self.on_snapshot(snapshot)
+        except Exception as e:
+            log_event(log, logging.ERROR, "background_rebuild_failed", data_dir=self.data_dir, error=str(e))
+            with self._lock:
+                self._status["last_error"] = str(e)
+                self._status["last_error_at"] = datetime.now()
+                self._status["failures"] += 1
+            return False
+
+        with self._lock:
+            if snapshot["version"] != previous:
+                self._status["rebuilds"] += 1
+            self._status["version"] = snapshot["version"]
+            self._status["built_at"] = snapshot["built_at"]
+            self._status["build_seconds"] = snapshot["build_seconds"]
+            self._status["last_error"] = None
+        return True
+
+    def run(self):
+        """Builds once, then watches in the calling thread until stop()."""
+        self.refresh()
+        if self.watch_mode == "inotify":
+            self._watch_inotify()
+        else:
+            self._watch_polling()
+
+    def _watch_polling(self):
+        fingerprint = self._safe_fingerprint()
+        while not self._stop.wait(self.interval):
+            current = self._safe_fingerprint()
+            # Only a successful rebuild counts as handling the change
+            if current != fingerprint and self.refresh():
+                fingerprint = current
+
+    def _watch_inotify(self):
+        flags = inotify_simple.flags
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.CREATE | flags.DELETE
+        rules_file = get_bom_rules_file(self.data_dir)
+        rules_dir = os.path.dirname(rules_file)
+        with inotify_simple.INotify() as inotify:
+            data_watch = inotify.add_watch(self.data_dir, mask)
+            # The bundled rules file lives outside data_dir; only it matters in its folder
+            rules_watch = inotify.add_watch(rules_dir, mask) if rules_dir != self.data_dir else data_watch
+            with self._lock:
+                pending = self._status["last_error"] is not None
+            while not self._stop.is_set():
+                events = inotify.read(timeout=int(self.interval * 1000))
+                relevant = [event for event in events if event.wd == data_watch
+                            or (event.wd == rules_watch and event.name == os.path.basename(rules_file))]
+                if relevant or pending:
+                    # Let a multi-file drop settle before rebuilding once
+                    time.sleep(0.5)
+                    inotify.read(timeout=0)
+                    pending = not self.refresh()
+
+    def _safe_fingerprint(self):
+        try:
+            return get_data_fingerprint(self.data_dir)
+        except OSError:
+            return None
+
+def start_refresher(data_dir, interval=5.0):
+    """Creates and starts a SnapshotRefresher for data_dir."""
+    return SnapshotRefresher(os.path.abspath(data_dir), interval).start()
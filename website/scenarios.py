@@ -0,0 +1,135 @@
+# Batch what-if evaluation of alternative shipment schedules
+#
+# A scenario overrides the quantity, number or frequency of some shipment
+# items; every other item keeps its Shipment.csv schedule. A whole batch is
+# laid out as (scenarios x items) arrays and classified in one pass against
+# the snapshot's average usage, with the same rules as the inventory table.
+import numbers
+
+import numpy as np
+import pandas as pd
+
+from .projection import LOW_STOCK_BUFFER, SHIPMENTS_PER_MONTH, STOCK_RULES, classify_stock, parse_frequency
+
+MAX_SCENARIOS = 10000
+SCENARIO_FIELDS = ('quantity', 'number', 'frequency')
+STOCK_STATUSES = ('Low Stock', 'Stocked', 'Surplus')
+
+def current_plan(bom, shipment_df, avg_shipment_usage):
+    """
+    The Shipment.csv schedule of every bom shipment item it lists, indexed
+    by shipment name: Ingredient, Unit, Avg_Monthly_Usage, Quantity,
+    Number, Shipments_Per_Month and Conversion (shipment unit -> bom unit).
+    """
+    shipments = shipment_df.drop_duplicates('Ingredient').set_index('Ingredient')
+    plan = pd.DataFrame({
+        'Ingredient': bom.shipment_labels,
+        'Unit': bom.shipment_units,
+        'Avg_Monthly_Usage': avg_shipment_usage,
+    }, index=pd.Index(bom.shipments, name='Shipment_Name'))
+    plan = plan[plan.index.isin(shipments.index)]
+    shipments = shipments.loc[plan.index]
+    plan['Quantity'] = shipments['Quantity per shipment'].astype(float)
+    plan['Number'] = shipments['Number of shipments'].astype(float)
+    plan['Shipments_Per_Month'] = shipments['frequency'].map(parse_frequency).map(SHIPMENTS_PER_MONTH).fillna(0)
+    plan['Conversion'] = shipments['Unit of shipment'].map(bom.unit_conversions).fillna(1).astype(float)
+    return plan
+
+def check_amount(value, what):
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or not value >= 0:
+        raise ValueError(f"{what} must be a non-negative number, got {value!r}")
+    return float(value)
+
+def scenario_arrays(plan, scenarios):
+    """
+    Lays scenarios out as (scenarios x items) arrays, starting from the
+    current plan. Each scenario is {"name": ..., "shipments": {shipment
+    name: {"quantity", "number", "frequency"}}} with every key optional.
+    Returns (names, quantity, number, shipments_per_month); raises
+    ValueError for anything that doesn't fit the plan.
+    """
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request, got {len(scenarios)}")
+
+    columns = {name: i for i, name in enumerate(plan.index)}
+    shape = (len(scenarios), len(plan))
+    quantity = np.broadcast_to(plan['Quantity'].to_numpy(), shape).copy()
+    number = np.broadcast_to(plan['Number'].to_numpy(), shape).copy()
+    per_month = np.broadcast_to(plan['Shipments_Per_Month'].to_numpy(dtype=float), shape).copy()
+
+    names = []
+    for row, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"Scenario {row + 1} must be an object")
+        names.append(str(scenario.get('name') or f"Scenario {row + 1}"))
+        overrides = scenario.get('shipments') or {}
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{names[-1]}: 'shipments' must map shipment names to changes")
+        for shipment, changes in overrides.items():
+            col = columns.get(shipment)
+            if col is None:
+                raise ValueError(f"{names[-1]}: unknown shipment '{shipment}'")
+            if not isinstance(changes, dict) or set(changes) - set(SCENARIO_FIELDS):
+                raise ValueError(f"{names[-1]}: changes to '{shipment}' may only set {SCENARIO_FIELDS}")
+            if 'quantity' in changes:
+                quantity[row, col] = check_amount(changes['quantity'], f"{names[-1]}: {shipment} quantity")
+            if 'number' in changes:
+                number[row, col] = check_amount(changes['number'], f"{names[-1]}: {shipment} number")
+            if 'frequency' in changes:
+                frequency = parse_frequency(changes['frequency'])
+                if frequency is None:
+                    raise ValueError(f"{names[-1]}: {shipment} frequency must be one of {tuple(SHIPMENTS_PER_MONTH)}")
+                per_month[row, col] = SHIPMENTS_PER_MONTH[frequency]
+    return names, quantity, number, per_month
+
+def evaluate_scenarios(plan, scenarios, target_buffer=LOW_STOCK_BUFFER, unit_costs=None, delivery_cost=0.0):
+    """
+    Classifies every item under every scenario and prices each plan.
+
+    A scenario meets the target when every item with sales keeps a monthly
+    buffer of at least target_buffer x its usage. Monthly cost is the
+    shipment units ordered times unit_costs ({shipment name: cost per
+    shipment unit}, default 1) plus delivery_cost per delivery. Returns
+    (results, cheapest): one results row per scenario and the position of
+    the cheapest one meeting the target (None if none does).
+    """
+    target_buffer = check_amount(target_buffer, "target_buffer")
+    delivery_cost = check_amount(delivery_cost, "delivery_cost")
+    unit_costs = unit_costs or {}
+    if not isinstance(unit_costs, dict):
+        raise ValueError("unit_costs must map shipment names to a cost per shipment unit")
+    unknown = set(unit_costs) - set(plan.index)
+    if unknown:
+        raise ValueError(f"unit_costs names unknown shipments: {sorted(unknown)}")
+    cost = np.array([check_amount(unit_costs.get(name, 1), f"unit cost of {name}") for name in plan.index])
+
+    names, quantity, number, per_month = scenario_arrays(plan, scenarios)
+    usage = plan['Avg_Monthly_Usage'].to_numpy(dtype=float)
+
+    # --- Every scenario x item at once ---
+    units_per_month = quantity * number * per_month
+    stock_delta = units_per_month * plan['Conversion'].to_numpy() - usage
+    rule_status = np.array([STOCK_STATUSES.index(status) for status, _ in STOCK_RULES])
+    status = rule_status[classify_stock(usage, stock_delta)]
+    meets_target = ((stock_delta >= usage * target_buffer) | (usage <= 0)).all(axis=1)
+    monthly_cost = units_per_month @ cost + delivery_cost * np.where(quantity * number > 0, per_month, 0).sum(axis=1)
+
+    low_rows, low_cols = np.nonzero(status == 0)
+    labels = plan['Ingredient'].to_numpy()
+    low_items = np.split(labels[low_cols], np.searchsorted(low_rows, np.arange(1, len(names))))
+
+    results = pd.DataFrame({
+        'Scenario': names,
+        'Low_Stock': (status == 0).sum(axis=1),
+        'Stocked': (status == 1).sum(axis=1),
+        'Surplus': (status == 2).sum(axis=1),
+        'Low_Stock_Items': [items.tolist() for items in low_items],
+        'Monthly_Cost': monthly_cost,
+        'Meets_Target': meets_target,
+    })
+    cheapest = None
+    if meets_target.any():
+        cheapest = int(np.argmin(np.where(meets_target, monthly_cost, np.inf)))
+    return results, cheapest
@@ -0,0 +1,91 @@
+# Compact in-memory schema for the resident item/warehouse frames
+#
+# Names, categories and months repeat on every row, so they are stored as
+# categoricals (the Month dtype is the same ordered one revenue_df uses).
+# Counts are narrowed to the smallest integer type that holds them and
+# amounts are kept as fixed-point cents in 'Amount_Cents', which is exact
+# and half the size of float64 for realistic per-row amounts.
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ('Item Name', 'Category', 'Group')
+AMOUNT_CENTS = 'Amount_Cents'
+
+def month_dtype(month_order):
+    """Ordered categorical dtype shared by every frame's Month column."""
+    return pd.CategoricalDtype(month_order, ordered=True)
+
+def compact_counts(values):
+    """Smallest integer dtype for whole counts; float32 if any are missing or fractional."""
+    values = pd.to_numeric(values, errors='coerce')
+    array = values.to_numpy(dtype=float)
+    if len(array) and (np.isnan(array).any() or (array != np.round(array)).any()):
+        return values.astype('float32')
+    return pd.to_numeric(values.astype('int64'), downcast='integer')
+
+def to_cents(values):
+    """
+    Dollar amounts as integer cents (int32 when they fit, else int64).
+    Columns with missing amounts stay float64 cents, NaN included.
+    """
+    cents = np.round(pd.to_numeric(values, errors='coerce').to_numpy(dtype=float) * 100)
+    if np.isnan(cents).any():
+        return pd.Series(cents, index=values.index)
+    dtype = 'int32' if not len(cents) or np.abs(cents).max() <= np.iinfo(np.int32).max else 'int64'
+    return pd.Series(cents.astype(dtype), index=values.index)
+
+def from_cents(values):
+    """'Amount_Cents' back to float64 dollars."""
+    return values.to_numpy(dtype=float) / 100
+
+def compact_frame(df, month_order=None):
+    """
+    Returns df in the compact schema: key columns as categoricals, Month as
+    month_dtype(month_order), Count and other integer columns narrowed and
+    Amount replaced by Amount_Cents.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in KEY_COLUMNS:
+            columns[col] = values.astype('category')
+        elif col == 'Month' and month_order is not None:
+            columns[col] = values.astype(month_dtype(month_order))
+        elif col == 'Count':
+            columns[col] = compact_counts(values)
+        elif col == 'Amount':
+            columns[AMOUNT_CENTS] = to_cents(values)
+        elif pd.api.types.is_integer_dtype(values):
+            columns[col] = pd.to_numeric(values, downcast='integer')
+        else:
+            columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def frame_bytes(obj):
+    """Deep size in bytes of a DataFrame, Series, array or MonthCube."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    return sum(value.nbytes for value in vars(obj).values() if isinstance(value, np.ndarray))
+
+def memory_report(frames):
+    """
+    {name: {'rows', 'bytes', 'columns': {column: bytes}}} for every frame of
+    a snapshot, with the month cubes reported per cube.
+    """
+    report = {}
+    for name, frame in frames.items():
+        if name == 'cubes':
+            for cube_name, cube in frame.items():
+                report[f"cubes.{cube_name}"] = {"rows": len(cube.months), "bytes": frame_bytes(cube), "columns": {}}
+            continue
+        if isinstance(frame, pd.DataFrame):
+            usage = frame.memory_usage(deep=True, index=False)
+            columns = {col: int(size) for col, size in usage.items()}
+        else:
+            columns = {}
+        report[name] = {"rows": len(frame), "bytes": frame_bytes(frame), "columns": columns}
+    return report
@@ -0,0 +1,210 @@
+# Dashboard snapshots shared by every worker process
+#
+# One builder process builds the snapshot and publishes it to
+# .snapshots/published/<version>/: frames as uncompressed Arrow files, cube
+# arrays as .npy files and the small bundle as a pickle. current.json names
+# the live version and carries a generation counter. Workers memory-map the
+# published files, so the data pages live once in the OS page cache however
+# many workers read them, and a new worker (or a new version) is ready after
+# reading a few headers instead of parsing every workbook.
+#
+#   python -m website.shared           publish the current data and exit
+#   python -m website.shared --watch   keep publishing as data/ changes
+import argparse
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from .cubes import MonthCube
+from .metrics import log_event, record_cache
+from .snapshots import SNAPSHOT_DIR_NAME, read_table, write_table
+
+log = logging.getLogger(__name__)
+
+PUBLISH_DIR_NAME = "published"
+CURRENT_FILE = "current.json"
+KEEP_PUBLISHED = 3
+SHARED_FRAMES = ('revenue_df', 'item_df', 'warehouse_df', 'top_items_df')
+
+def get_publish_dir(data_dir):
+    """$MSY_SHARED_DIR, or data_dir/.snapshots/published."""
+    if os.environ.get("MSY_SHARED_DIR"):
+        return os.path.abspath(os.environ["MSY_SHARED_DIR"])
+    return os.path.join(data_dir, SNAPSHOT_DIR_NAME, PUBLISH_DIR_NAME)
+
+def read_current(publish_dir):
+    """The current.json pointer ({generation, version, ...}), or None if nothing is published."""
+    try:
+        with open(os.path.join(publish_dir, CURRENT_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# --- Publishing (builder process) ---
+
+def write_published(snapshot, path):
+    """Writes one snapshot's frames, cubes and bundle into the folder path."""
+    os.makedirs(path)
+    frames = snapshot['frames']
+    for name in SHARED_FRAMES:
+        write_table(frames[name].reset_index(drop=True), os.path.join(path, f"{name}.arrow"))
+
+    cubes = {}
+    for name, cube in frames['cubes'].items():
+        np.save(os.path.join(path, f"cube.{name}.matrix.npy"), cube.matrix)
+        np.save(os.path.join(path, f"cube.{name}.prefix.npy"), cube.prefix)
+        cubes[name] = {"months": cube.months, "keys": cube.keys}
+    with open(os.path.join(path, "cubes.json"), "w") as f:
+        json.dump(cubes, f)
+
+    meta = {key: snapshot[key] for key in ('data_dir', 'fingerprint', 'version', 'bundle', 'built_at', 'build_seconds')}
+    with open(os.path.join(path, "snapshot.pkl"), "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def publish_snapshot(snapshot, publish_dir=None):
+    """
+    Publishes snapshot unless its version is already live, then points
+    current.json at it with the next generation number. Returns the
+    current.json contents.
+    """
+    publish_dir = publish_dir or get_publish_dir(snapshot['data_dir'])
+    current = read_current(publish_dir)
+    if current is not None and current['version'] == snapshot['version']:
+        return current
+
+    target = os.path.join(publish_dir, snapshot['version'])
+    if not os.path.isdir(target):
+        # Written under a temporary name and renamed, so readers never see half a snapshot
+        tmp_path = os.path.join(publish_dir, f".tmp-{snapshot['version']}-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        write_published(snapshot, tmp_path)
+        os.rename(tmp_path, target)
+
+    current = {
+        "generation": (current['generation'] if current else 0) + 1,
+        "version": snapshot['version'],
+        "data_dir": snapshot['data_dir'],
+        "published_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp_path = os.path.join(publish_dir, f"{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(current, f)
+    os.replace(tmp_path, os.path.join(publish_dir, CURRENT_FILE))
+    log_event(log, logging.INFO, "snapshot_published", version=current['version'], generation=current['generation'])
+
+    prune_published(publish_dir, keep=current['version'])
+    return current
+
+def prune_published(publish_dir, keep):
+    """
+    Removes all but the KEEP_PUBLISHED newest versions (never keep). Workers
+    still mapping a removed version keep reading it until they move on.
+    """
+    versions = [entry for entry in os.scandir(publish_dir) if entry.is_dir() and not entry.name.startswith(".")]
+    versions.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in versions[KEEP_PUBLISHED:]:
+        if entry.name != keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+# --- Reading (worker processes) ---
+
+def load_published(path):
+    """Loads a published snapshot folder with every frame and cube memory-mapped."""
+    with open(os.path.join(path, "snapshot.pkl"), "rb") as f:
+        snapshot = pickle.load(f)
+    frames = {name: read_table(os.path.join(path, f"{name}.arrow"), memory_map=True) for name in SHARED_FRAMES}
+
+    with open(os.path.join(path, "cubes.json")) as f:
+        cube_keys = json.load(f)
+    frames['cubes'] = {
+        name: MonthCube.from_prefix(
+            keys['months'], keys['keys'],
+            np.load(os.path.join(path, f"cube.{name}.matrix.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"cube.{name}.prefix.npy"), mmap_mode="r"))
+        for name, keys in cube_keys.items()
+    }
+    snapshot['frames'] = frames
+    return snapshot
+
+class SharedSnapshotReader:
+    """
+    Serves the snapshot the builder last published for data_dir. Each get()
+    costs one stat() of current.json; a new generation is mapped in on the
+    first request that sees it.
+    """
+
+    def __init__(self, data_dir, publish_dir=None):
+        self.data_dir = data_dir
+        self.publish_dir = publish_dir or get_publish_dir(data_dir)
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._generation = None
+        self._snapshot = None
+
+    def get(self):
+        """The live published snapshot, or None if nothing has been published yet."""
+        try:
+            stat = os.stat(os.path.join(self.publish_dir, CURRENT_FILE))
+        except FileNotFoundError:
+            return self._snapshot
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._stat_key:
+            record_cache("shared_snapshot", True)
+            return self._snapshot
+
+        with self._lock:
+            if stat_key != self._stat_key:
+                current = read_current(self.publish_dir)
+                if current is not None and current['generation'] != self._generation:
+                    try:
+                        self._snapshot = load_published(os.path.join(self.publish_dir, current['version']))
+                        self._generation = current['generation']
+                        log_event(log, logging.INFO, "shared_snapshot_loaded", version=current['version'],
+                                  generation=current['generation'])
+                    except (OSError, ValueError, pickle.UnpicklingError) as e:
+                        # Caught mid-prune or mid-publish; retried on the next request
+                        log_event(log, logging.WARNING, "shared_snapshot_unreadable", version=current['version'],
+                                  error=str(e))
+                        record_cache("shared_snapshot", False)
+                        return self._snapshot
+                self._stat_key = stat_key
+        record_cache("shared_snapshot", False)
+        return self._snapshot
+
+    def status(self):
+        """Generation and version being served, for /status/snapshot."""
+        snapshot = self._snapshot
+        return {
+            "mode": "shared",
+            "running": True,
+            "generation": self._generation,
+            "version": snapshot['version'] if snapshot else None,
+            "built_at": snapshot['built_at'] if snapshot else None,
+            "build_seconds": snapshot['build_seconds'] if snapshot else None,
+            "publish_dir": self.publish_dir,
+        }
+
+if __name__ == "__main__":
+    from .analysis import get_dashboard_snapshot, get_location_dir
+    from .metrics import configure_logging
+    from .refresher import SnapshotRefresher
+
+    parser = argparse.ArgumentParser(description="Build and publish the dashboard snapshot for worker processes")
+    parser.add_argument('--data-dir', default=None, help="store folder to publish (default: the default location)")
+    parser.add_argument('--watch', action='store_true', help="keep publishing whenever data/ changes")
+    parser.add_argument('--interval', type=float, default=float(os.environ.get("MSY_SNAPSHOT_REFRESH_INTERVAL", "5")))
+    args = parser.parse_args()
+    configure_logging(os.environ.get("MSY_LOG_LEVEL", "INFO"), os.environ.get("MSY_LOG_FORMAT", "text"))
+
+    data_dir = os.path.abspath(args.data_dir or get_location_dir())
+    os.makedirs(get_publish_dir(data_dir), exist_ok=True)
+    if args.watch:
+        SnapshotRefresher(data_dir, args.interval, on_snapshot=publish_snapshot).run()
+    else:
+        publish_snapshot(get_dashboard_snapshot(data_dir))
@@ -0,0 +1,153 @@
+# Columnar (Arrow IPC) snapshots of parsed data files
+#
+# Each source file in website/data/ gets cleaned, typed Arrow files in
+# website/data/.snapshots/ that are much cheaper to reload than xlsx/csv.
+import json
+import logging
+import os
+
+import pandas as pd
+
+from .metrics import FILES_PARSED, log_event, record_cache
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # snapshots are an optimisation, xlsx/csv still work
+    pa = None
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR_NAME = ".snapshots"
+SNAPSHOTS_ENABLED = os.environ.get("MSY_SNAPSHOTS", "1") != "0" and pa is not None
+SNAPSHOT_MEMORY_MAP = os.environ.get("MSY_SNAPSHOT_MMAP", "0") == "1"
+
+def get_snapshot_dir(source_path):
+    """Returns the .snapshots/ folder that sits beside source_path."""
+    return os.path.join(os.path.dirname(source_path), SNAPSHOT_DIR_NAME)
+
+def get_snapshot_path(source_path, role):
+    """Returns the Arrow file holding one role (sheet) of source_path."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(get_snapshot_dir(source_path), f"{stem}.{role}.arrow")
+
+def get_manifest_path(source_path):
+    """Returns the manifest listing the roles snapshotted for source_path."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(get_snapshot_dir(source_path), f"{stem}.manifest.json")
+
+def write_table(df, path):
+    """Writes df as an uncompressed Arrow IPC file (so it can be memory-mapped)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def read_table(path, memory_map=False):
+    """
+    Reads an Arrow IPC file into a DataFrame. With memory_map, numeric
+    columns stay backed by the mapped file instead of being copied.
+    """
+    if memory_map:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(split_blocks=True)
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+def get_file_key(path):
+    """(name, mtime, size) of a source file; changes whenever it is replaced."""
+    stat = os.stat(path)
+    return (os.path.basename(path), stat.st_mtime_ns, stat.st_size)
+
+def get_source_stamp(source_path):
+    """Returns [mtime_ns, size] of source_path, as recorded in its manifest."""
+    stat = os.stat(source_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def is_fresh(source_path):
+    """
+    True if source_path has a complete snapshot taken from exactly this
+    version of the source. The manifest records the source's mtime and size
+    rather than relying on its own mtime, so a file restored or replaced
+    with an older mtime is still re-parsed.
+    """
+    try:
+        with open(get_manifest_path(source_path)) as f:
+            manifest = json.load(f)
+        return manifest.get("source_stamp") == get_source_stamp(source_path)
+    except (FileNotFoundError, ValueError):
+        return False
+
+def save_snapshot(source_path, frames):
+    """Writes {role: DataFrame} for source_path, then its manifest."""
+    os.makedirs(get_snapshot_dir(source_path), exist_ok=True)
+    source_stamp = get_source_stamp(source_path)
+    for role, df in frames.items():
+        write_table(df, get_snapshot_path(source_path, role))
+
+    # The manifest is written last so a half-written snapshot is never used
+    manifest_path = get_manifest_path(source_path)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "source": os.path.basename(source_path),
+            "source_stamp": source_stamp,
+            "roles": sorted(frames),
+        }, f)
+    os.replace(tmp_path, manifest_path)
+
+def load_snapshot(source_path, memory_map=False):
+    """Returns {role: DataFrame} from the snapshot of source_path."""
+    with open(get_manifest_path(source_path)) as f:
+        roles = json.load(f)["roles"]
+    frames = {}
+    for role in roles:
+        frames[role] = read_table(get_snapshot_path(source_path, role), memory_map=memory_map)
+    return frames
+
+def load_with_snapshot(source_path, build_frames, memory_map=None):
+    """
+    Returns {role: DataFrame} for source_path, reading its snapshot when it
+    was taken from the current source and otherwise calling build_frames(source_path)
+    and saving the result as the new snapshot.
+    """
+    if not SNAPSHOTS_ENABLED:
+        return build_frames(source_path)
+    if memory_map is None:
+        memory_map = SNAPSHOT_MEMORY_MAP
+
+    fresh = is_fresh(source_path)
+    record_cache("arrow_snapshot", fresh)
+    if fresh:
+        try:
+            return load_snapshot(source_path, memory_map=memory_map)
+        except Exception as e:
+            log_event(log, logging.WARNING, "snapshot_unreadable", file=os.path.basename(source_path), error=str(e))
+
+    frames = build_frames(source_path)
+    try:
+        save_snapshot(source_path, frames)
+    except OSError as e:
+        log_event(log, logging.WARNING, "snapshot_write_failed", file=os.path.basename(source_path), error=str(e))
+    return frames
+
+def parse_csv(source_path):
+    """pd.read_csv() of source_path, counted as a parsed file."""
+    df = pd.read_csv(source_path)
+    FILES_PARSED.inc(kind="csv")
+    log_event(log, logging.INFO, "file_parsed", file=os.path.basename(source_path), rows=len(df))
+    return {"table": df}
+
+def read_csv_snapshot(source_path, memory_map=None):
+    """pd.read_csv() through the snapshot store."""
+    return load_with_snapshot(source_path, parse_csv, memory_map)["table"]
+
+if __name__ == "__main__":
+    # python -m website.snapshots : convert everything in website/data/ now
+    from .analysis import build_snapshots
+    from .metrics import configure_logging
+    configure_logging(os.environ.get("MSY_LOG_LEVEL", "INFO"), os.environ.get("MSY_LOG_FORMAT", "text"))
+    build_snapshots()
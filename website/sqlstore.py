@@ -0,0 +1,243 @@
+# SQLite analytical store for the dashboard
+#
+# Month workbooks, recipes and shipments are loaded once into indexed tables
+# (see the "Analytical Store" models in models.py); the dashboard aggregates are
+# then SQL GROUP BY queries, so history grows on disk instead of in memory and
+# only changed files are ever parsed again.
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+
+from .models import CategoryRevenue, DataSource, GroupRevenue, ItemSale, RecipeIngredient, ShipmentSchedule
+
+ANALYTICS_DB_NAME = "analytics.db"
+ANALYTICS_TABLES = [model.__table__ for model in
+                    (DataSource, ItemSale, CategoryRevenue, GroupRevenue, RecipeIngredient, ShipmentSchedule)]
+
+_store_lock = threading.Lock()
+_stores = {}
+
+def get_analytics_db_path(data_dir, root=None):
+    """
+    analytics.db in data_dir's .snapshots/ folder, or $MSY_ANALYTICS_DB when
+    data_dir is the data root itself. Stores in sub-folders always keep
+    their own database: sources are tracked by file name alone, so stores
+    sharing one would delete each other's months on every sync.
+    """
+    is_root = root is None or os.path.normpath(data_dir) == os.path.normpath(root)
+    if os.environ.get("MSY_ANALYTICS_DB") and is_root:
+        return os.path.abspath(os.environ["MSY_ANALYTICS_DB"])
+    return os.path.join(data_dir, ".snapshots", ANALYTICS_DB_NAME)
+
+def create_analytics_engine(db_path):
+    """SQLite engine in WAL mode, so readers never block on a sync."""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    ANALYTICS_TABLES[0].metadata.create_all(engine, tables=ANALYTICS_TABLES)
+    return engine
+
+def month_rows(source_id, sheets):
+    """Per-table insert rows for one month's cleaned sheets and partials."""
+    rows = {"item": [], "category": [], "group": []}
+    item_totals = sheets.get('item_totals')
+    if item_totals is not None:
+        rows["item"] = [{"source_id": source_id, "item_name": name, "count": count, "amount": amount}
+                        for name, amount, count in item_totals[['Item Name', 'Amount', 'Count']].itertuples(index=False)]
+    category_totals = sheets.get('category_totals')
+    if category_totals is not None:
+        rows["category"] = [{"source_id": source_id, "category": name, "amount": amount}
+                            for name, amount in category_totals[['Category', 'Amount']].itertuples(index=False)]
+    revenue = sheets.get('revenue')
+    if revenue is not None:
+        rows["group"] = [{"source_id": source_id, "group_name": name, "count": count, "amount": amount}
+                         for name, count, amount in revenue[['Group', 'Count', 'Amount']].itertuples(index=False)]
+    return {key: [clean_row(row) for row in value] for key, value in rows.items()}
+
+def clean_row(row):
+    """NaN -> NULL and numpy scalars -> Python numbers for the DB-API driver."""
+    return {key: (None if isinstance(value, float) and value != value else
+                  value.item() if hasattr(value, "item") else value)
+            for key, value in row.items()}
+
+class AnalyticsStore:
+    """One data folder's SQLite analytical database."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.engine = create_analytics_engine(db_path)
+        self._lock = threading.Lock()
+
+    # --- Ingestion ---
+
+    def source_keys(self):
+        """{file name: (file name, mtime_ns, size)} of everything loaded so far."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT file_name, mtime_ns, size FROM data_source")).all()
+        return {name: (name, mtime_ns, size) for name, mtime_ns, size in rows}
+
+    def stale_files(self, file_keys):
+        """File names in {file name: key} that are new or changed since they were loaded."""
+        loaded = self.source_keys()
+        return [name for name, key in file_keys.items() if loaded.get(name) != tuple(key)]
+
+    def sync(self, month_keys, month_labels, loaded_months, recipes=None, shipments=None):
+        """
+        Brings the database in line with data/ in a single transaction.
+
+        month_keys is {file name: file key} for every month file present,
+        month_labels {file name: month label}, loaded_months {file name:
+        sheets} for the files that changed. recipes and shipments are
+        (file key, DataFrame) pairs, given only when the CSV changed.
+        """
+        with self._lock, self.engine.begin() as conn:
+            present = set(month_keys)
+            existing = conn.execute(text("SELECT id, file_name FROM data_source WHERE kind = 'month'")).all()
+            removed = [source_id for source_id, name in existing if name not in present]
+            replaced = [source_id for source_id, name in existing if name in loaded_months]
+            self._delete_sources(conn, removed + replaced)
+
+            item_rows, category_rows, group_rows = [], [], []
+            for file_name, sheets in loaded_months.items():
+                key = month_keys[file_name]
+                source_id = conn.execute(DataSource.__table__.insert().values(
+                    file_name=file_name, kind="month", label=month_labels[file_name],
+                    mtime_ns=key[1], size=key[2])).inserted_primary_key[0]
+                rows = month_rows(source_id, sheets)
+                item_rows += rows["item"]
+                category_rows += rows["category"]
+                group_rows += rows["group"]
+            # Labels change when a year is added to the data, so refresh them all
+            for file_name, label in month_labels.items():
+                conn.execute(text("UPDATE data_source SET label = :label WHERE file_name = :name"),
+                             {"label": label, "name": file_name})
+
+            if item_rows:
+                conn.execute(ItemSale.__table__.insert(), item_rows)
+            if category_rows:
+                conn.execute(CategoryRevenue.__table__.insert(), category_rows)
+            if group_rows:
+                conn.execute(GroupRevenue.__table__.insert(), group_rows)
+
+            if recipes is not None:
+                self._replace_table_source(conn, "recipes", recipes[0], RecipeIngredient.__table__, recipes[1])
+            if shipments is not None:
+                self._replace_table_source(conn, "shipments", shipments[0], ShipmentSchedule.__table__, shipments[1])
+
+    def _delete_sources(self, conn, source_ids):
+        if not source_ids:
+            return
+        params = {f"id{i}": source_id for i, source_id in enumerate(source_ids)}
+        placeholders = ", ".join(f":{name}" for name in params)
+        for table in ("item_sale", "category_revenue", "group_revenue"):
+            conn.execute(text(f"DELETE FROM {table} WHERE source_id IN ({placeholders})"), params)
+        conn.execute(text(f"DELETE FROM data_source WHERE id IN ({placeholders})"), params)
+
+    def _replace_table_source(self, conn, kind, key, table, rows):
+        conn.execute(text("DELETE FROM data_source WHERE kind = :kind"), {"kind": kind})
+        conn.execute(table.delete())
+        conn.execute(DataSource.__table__.insert().values(file_name=key[0], kind=kind, mtime_ns=key[1], size=key[2]))
+        if rows:
+            conn.execute(table.insert(), [clean_row(row) for row in rows])
+
+    # --- Dashboard Queries ---
+
+    def query(self, sql, params=None):
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(text(sql), conn, params=params or {})
+
+    def monthly_revenue(self, month_order):
+        """Month, Total_Revenue for months that had a revenue sheet, in month_order."""
+        df = self.query("""
+            SELECT s.label AS Month, ROUND(SUM(g.amount), 2) AS Total_Revenue
+            FROM group_revenue g JOIN data_source s ON s.id = g.source_id
+            GROUP BY s.label
+        """)
+        df['Month'] = pd.Categorical(df['Month'], categories=month_order, ordered=True)
+        return df.dropna(subset=['Month']).sort_values('Month').reset_index(drop=True)
+
+    def top_items(self):
+        """Items by total revenue: Item Name, Amount, Count, Months_Data, Avg_Price."""
+        df = self.query("""
+            SELECT item_name AS "Item Name", ROUND(TOTAL(amount), 2) AS Amount,
+                   CAST(TOTAL(count) AS INTEGER) AS Count, COUNT(*) AS Months_Data
+            FROM item_sale
+            GROUP BY item_name
+            ORDER BY item_name
+        """)
+        df = df.sort_values(by='Amount', ascending=False).reset_index(drop=True)
+        df['Avg_Price'] = df['Amount'] / df['Count']
+        return df
+
+    def category_revenue(self):
+        """Total revenue per warehouse category (sorted by name)."""
+        df = self.query("""
+            SELECT category AS Category, ROUND(TOTAL(amount), 2) AS Amount
+            FROM category_revenue GROUP BY category ORDER BY category
+        """)
+        return df.set_index('Category')['Amount']
+
+    def item_month_rows(self):
+        """Month, Item Name, Count, Amount: one row per item and month."""
+        return self.query("""
+            SELECT s.label AS Month, i.item_name AS "Item Name", i.count AS Count, i.amount AS Amount
+            FROM item_sale i JOIN data_source s ON s.id = i.source_id
+        """)
+
+    def category_month_rows(self):
+        """Month, Category, Amount: one row per category and month."""
+        return self.query("""
+            SELECT s.label AS Month, c.category AS Category, c.amount AS Amount
+            FROM category_revenue c JOIN data_source s ON s.id = c.source_id
+        """)
+
+    def ingredient_usage(self):
+        """Total units of every recipe ingredient implied by all item sales."""
+        df = self.query("""
+            SELECT r.ingredient AS Ingredient, TOTAL(i.count * r.quantity) AS Usage
+            FROM item_sale i JOIN recipe_ingredient r ON r.item_name = i.item_name
+            GROUP BY r.ingredient
+        """)
+        return df.set_index('Ingredient')['Usage']
+
+    def shipments(self):
+        """The shipment schedule with the Shipment.csv column names."""
+        return self.query("""
+            SELECT ingredient AS "Ingredient", quantity_per_shipment AS "Quantity per shipment",
+                   unit AS "Unit of shipment", number_of_shipments AS "Number of shipments", frequency
+            FROM shipment_schedule ORDER BY id
+        """)
+
+def recipe_rows(bom):
+    """RecipeIngredient rows from a compiled BillOfMaterials."""
+    rows = np.repeat(np.arange(len(bom.items)), np.diff(bom.indptr))
+    return [{"item_name": bom.items[i], "ingredient": bom.ingredients[j],
+             "unit": bom.units[bom.ingredients[j]], "quantity": quantity}
+            for i, j, quantity in zip(rows, bom.indices, bom.data)]
+
+def shipment_rows(shipment_df):
+    """ShipmentSchedule rows from the raw Shipment.csv frame."""
+    return [{"ingredient": row['Ingredient'], "quantity_per_shipment": row['Quantity per shipment'],
+             "unit": row['Unit of shipment'], "number_of_shipments": row['Number of shipments'],
+             "frequency": row['frequency']}
+            for row in shipment_df.to_dict('records')]
+
+def get_analytics_store(data_dir, root=None):
+    """The AnalyticsStore for data_dir (opened on first use); see get_analytics_db_path()."""
+    db_path = get_analytics_db_path(data_dir, root)
+    with _store_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = AnalyticsStore(db_path)
+        return store
@@ -0,0 +1,105 @@
+# Streaming ingestion for large month exports
+#
+# Sheets are read in row chunks with openpyxl in read-only mode. Each chunk is
+# cleaned and folded into running per-key totals, so peak memory depends on
+# the chunk size and the number of distinct items/categories/groups rather
+# than on the number of rows in the export.
+import logging
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from .aggregates import add_totals
+from .metrics import log_event
+
+log = logging.getLogger(__name__)
+
+STREAM_CHUNK_ROWS = int(os.environ.get('MSY_STREAM_CHUNK_ROWS', '50000'))
+STREAM_THRESHOLD_BYTES = float(os.environ.get('MSY_STREAM_THRESHOLD_MB', '16')) * 1024 * 1024
+
+def should_stream(path):
+    """True if path is large enough to be read in chunks (MSY_STREAM_THRESHOLD_MB, 0 = always)."""
+    return os.path.getsize(path) >= STREAM_THRESHOLD_BYTES
+
+def iter_sheet_chunks(path, chunk_rows=None):
+    """
+    Yields (sheet name, DataFrame chunk) for every worksheet in path, at most
+    chunk_rows rows at a time. Blank rows are skipped; a sheet with only a
+    header yields one empty chunk so its columns are still seen.
+    """
+    chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+            width = len(columns)
+
+            chunk, emitted = [], False
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                chunk.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                if len(chunk) >= chunk_rows:
+                    yield worksheet.title, pd.DataFrame.from_records(chunk, columns=columns)
+                    chunk, emitted = [], True
+            if chunk or not emitted:
+                yield worksheet.title, pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+class RunningTotals:
+    """
+    Count/Amount totals per key, merged chunk by chunk with compensated sums.
+    Keys keep the order they first appear in, as in the sheet itself, so
+    later sums over the totals add them in the same order as over the rows.
+    """
+
+    def __init__(self, key_col):
+        self.key_col = key_col
+        self.rows = 0
+        self.totals = None
+        self._compensation = None
+        self._order = {}
+
+    def add(self, chunk):
+        self.rows += len(chunk)
+        self._order.update(dict.fromkeys(pd.unique(chunk[self.key_col].dropna())))
+        values = [col for col in ('Count', 'Amount') if col in chunk.columns]
+        partial = chunk.groupby(self.key_col)[values].sum()
+        self.totals, self._compensation = add_totals(self.totals, self._compensation, partial, 1)
+
+    def frame(self):
+        """Totals as a DataFrame with key_col, Count and Amount columns."""
+        if self.totals is None:
+            return pd.DataFrame(columns=[self.key_col, 'Count', 'Amount'])
+        return self.totals.reindex(list(self._order)).rename_axis(self.key_col).reset_index()
+
+def stream_month_workbook(path, roles, clean, chunk_rows=None):
+    """
+    Streams a month workbook into per-role totals: {role: DataFrame of
+    key, Count, Amount}. roles maps a header column to its role (see
+    analysis.SHEET_ROLES) and clean(chunk) converts Amount/Count.
+    """
+    running = {}
+    sheet_roles = {}
+    for sheet_name, chunk in iter_sheet_chunks(path, chunk_rows):
+        if sheet_name not in sheet_roles:
+            key_col = next((col for col in chunk.columns if col in roles), None)
+            sheet_roles[sheet_name] = key_col
+            if key_col is None:
+                log_event(log, logging.WARNING, "sheet_skipped", file=os.path.basename(path),
+                          sheet=sheet_name, reason="unknown layout")
+            else:
+                running[roles[key_col]] = RunningTotals(key_col)
+        key_col = sheet_roles[sheet_name]
+        if key_col is not None:
+            running[roles[key_col]].add(clean(chunk))
+
+    log_event(log, logging.DEBUG, "file_streamed", file=os.path.basename(path),
+              rows=sum(totals.rows for totals in running.values()))
+    return {role: totals.frame() for role, totals in running.items()}
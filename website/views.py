@@ -1,172 +1,194 @@
-from flask import Blueprint, render_template, json
-from .analysis import get_dashboard_data  # Import our function
-import numpy as np # Import numpy for calculations
-from datetime import datetime
+from flask import Blueprint, Response, json, jsonify, current_app, request, abort
+from .analysis import (get_current_snapshot, get_dashboard_snapshot, get_cache_stats, get_default_data_dir,  # Import our functions
+                       get_location_dir, get_location_status, get_months, get_window_snapshot)
+from .locations import list_locations, location_name
+from .forecasting import get_revenue_forecast
+from .metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from .pagecache import get_render_cache_stats, render_fragment, render_page
 
 views = Blueprint("views", __name__)
 
-def get_next_month(last_month_str):
-    """Helper to get the next month's 3-letter abbreviation"""
+def get_forecast(snapshot):
+    """Cached revenue forecast for the snapshot, using the configured model"""
+    return get_revenue_forecast(
+        snapshot,
+        current_app.config["FORECAST_MODEL"],
+        current_app.config["FORECAST_INTERVAL"],
+    )
+
+def get_request_location_dir():
+    """Data folder of the store in ?location= (the default location if absent)."""
     try:
-        # Get the month number (1-12)
-        last_month_num = datetime.strptime(last_month_str, '%B').month
-        # Get the next month's number
-        next_month_num = 1 if last_month_num == 12 else last_month_num + 1
-        # Get the 3-letter name for the next month
-        return datetime(2025, next_month_num, 1).strftime('%b')
-    except:
-        return "Nov" # Fallback
+        return get_location_dir(request.args.get("location"))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+def get_request_snapshot(start_arg="start", end_arg="end"):
+    """
+    The current snapshot of the ?location= store, narrowed to the month
+    window in the query string (?start=June&end=September, or ?last=3) when
+    one is given. Endpoints whose own protocol uses ?start= read the window
+    from other arguments.
+    """
+    snapshot = get_current_snapshot(get_request_location_dir())
+    args = request.args
+    try:
+        return get_window_snapshot(snapshot, args.get(start_arg), args.get(end_arg), args.get("last"))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+def get_window_context(snapshot):
+    """Template variables for the month window and store location pickers."""
+    months = get_months(snapshot)
+    start, end = snapshot.get("window", (months[0], months[-1]))
+    return {
+        "months": months,
+        "window_start": start,
+        "window_end": end,
+        "window_length": months.index(end) - months.index(start) + 1,
+        "locations": list(list_locations(get_default_data_dir())),
+        "current_location": location_name(get_default_data_dir(), snapshot['data_dir']),
+    }
+
+@views.app_context_processor
+def inject_location():
+    # Navigation links keep the ?location= the page was opened with
+    return {"location": request.args.get("location") or None}
+
+def get_page_variant():
+    """Settings every cached page depends on besides its snapshot and query string."""
+    return tuple(list_locations(get_default_data_dir()))
+
+def get_alerts_dropdown(snapshot):
+    """The topbar alert dropdown, rendered once per snapshot for every page."""
+    return render_fragment(snapshot, "_alerts_dropdown.html", low_stock_alerts=snapshot['bundle']['low_stock_alerts'])
 
 @views.route("/")
 def home():
     # 1. Get all the data from our analysis file
-    dashboard_data = get_dashboard_data()
-    
-    # 2. Prepare data for the chart
-    monthly_df = dashboard_data['monthly_revenue_df']
-    chart_labels = monthly_df['Month'].tolist()
-    chart_values = monthly_df['Total_Revenue'].tolist()
-
-    # --- 3. Calculate Prediction Range ---
-    x = np.array(range(len(chart_values)))
-    y = np.array(chart_values)
-    
-    # Fit a 1st-degree (linear) model
-    model = np.polyfit(x, y, 1)
-    predict = np.poly1d(model)
-    
-    # Calculate residuals (errors)
-    residuals = y - predict(x)
-    std_error = np.std(residuals)
-    
-    # Predict the next month (index 6)
-    predicted_revenue = predict(len(x))
-    good_month_pred = predicted_revenue + std_error
-    bad_month_pred = predicted_revenue - std_error
-    
-    # Create dataset for the main prediction line
-    prediction_data = [None] * len(chart_values)
-    prediction_data[-1] = chart_values[-1] # Connects the line
-    prediction_data.append(predicted_revenue)
-    
-    # Create dataset for the "Good Month" line
-    good_month_data = [None] * len(chart_values)
-    good_month_data[-1] = chart_values[-1]
-    good_month_data.append(good_month_pred)
-
-    # Create dataset for the "Bad Month" line
-    bad_month_data = [None] * len(chart_values)
-    bad_month_data[-1] = chart_values[-1]
-    bad_month_data.append(bad_month_pred)
-    
-    # Add the next month to the labels
-    next_month = get_next_month(chart_labels[-1])
-    chart_labels.append(next_month)
-    # --- End of Prediction ---
-
-    # 4. Pass all the data to the template
-    return render_template(
-        "home.html",
-        # KPI Cards
-        latest_revenue=f"${dashboard_data['latest_month_revenue']:,.2f}",
-        annual_revenue=f"${dashboard_data['total_6_month_revenue']:,.2f}",
-        
-        best_item_name=dashboard_data['best_selling_item_name'],
-        best_item_count=f"{dashboard_data['best_selling_item_count']:,} units",
-        top_warehouse_name=dashboard_data['top_warehouse_name'],
-        top_warehouse_revenue=f"${dashboard_data['top_warehouse_revenue']:,.2f} in revenue",
-        
-        # --- NEW KPI VARIABLES ---
-        highest_rev_item_name=dashboard_data['highest_revenue_item_name'],
-        highest_rev_item_amount=f"${dashboard_data['highest_revenue_item_amount']:,.2f}",
-        worst_item_name=dashboard_data['worst_selling_item_name'],
-        worst_item_count=f"{dashboard_data['worst_selling_item_count']:,} units",
-        # --- End of new KPIs ---
-        
-        # Chart Data
-        chart_labels=json.dumps(chart_labels),
-        chart_data=json.dumps(chart_values),
-        prediction_data=json.dumps(prediction_data),
-        good_month_data=json.dumps(good_month_data),
-        bad_month_data=json.dumps(bad_month_data),
-        
-        # Donut Chart Data
-        donut_chart_data=json.dumps(dashboard_data['donut_chart_data']),
-        
-        # --- NEW: Low Stock Alerts ---
-        low_stock_alerts=dashboard_data['low_stock_alerts']
-    )
+    snapshot = get_request_snapshot()
+
+    def get_context():
+        dashboard_data = snapshot['bundle']
+
+        # 2. Get the monthly chart with its prediction range (computed once per snapshot)
+        forecast = get_forecast(snapshot)
+
+        # 3. Pass all the data to the template
+        return dict(
+            # KPI Cards
+            latest_revenue=f"${dashboard_data['latest_month_revenue']:,.2f}",
+            annual_revenue=f"${dashboard_data['total_6_month_revenue']:,.2f}",
+
+            best_item_name=dashboard_data['best_selling_item_name'],
+            best_item_count=f"{dashboard_data['best_selling_item_count']:,} units",
+            top_warehouse_name=dashboard_data['top_warehouse_name'],
+            top_warehouse_revenue=f"${dashboard_data['top_warehouse_revenue']:,.2f} in revenue",
+
+            # --- NEW KPI VARIABLES ---
+            highest_rev_item_name=dashboard_data['highest_revenue_item_name'],
+            highest_rev_item_amount=f"${dashboard_data['highest_revenue_item_amount']:,.2f}",
+            worst_item_name=dashboard_data['worst_selling_item_name'],
+            worst_item_count=f"{dashboard_data['worst_selling_item_count']:,} units",
+            # --- End of new KPIs ---
+
+            # Chart Data
+            chart_labels=json.dumps(forecast['chart_labels']),
+            chart_data=json.dumps(forecast['chart_values']),
+            prediction_data=json.dumps(forecast['prediction_data']),
+            good_month_data=json.dumps(forecast['good_month_data']),
+            bad_month_data=json.dumps(forecast['bad_month_data']),
+
+            # Donut Chart Data
+            donut_chart_data=json.dumps(dashboard_data['donut_chart_data']),
+
+            # --- NEW: Low Stock Alerts ---
+            alerts_dropdown=get_alerts_dropdown(snapshot),
+
+            # Month window picker
+            **get_window_context(snapshot)
+        )
+
+    # 4. Rendered once per snapshot and query string, then served from the page cache
+    return render_page(snapshot, "home.html", get_context, get_page_variant(),
+                       current_app.config["FORECAST_MODEL"], current_app.config["FORECAST_INTERVAL"])
 
 @views.route("/charts")
 def charts():
     # 1. Get all the data from our analysis file
-    dashboard_data = get_dashboard_data()
-    
-    # 2. Prepare data for the monthly chart
-    monthly_df = dashboard_data['monthly_revenue_df']
-    chart_labels = monthly_df['Month'].tolist()
-    chart_values = monthly_df['Total_Revenue'].tolist()
-
-    # --- 3. Calculate Prediction Range ---
-    x = np.array(range(len(chart_values)))
-    y = np.array(chart_values)
-    model = np.polyfit(x, y, 1)
-    predict = np.poly1d(model)
-    
-    residuals = y - predict(x)
-    std_error = np.std(residuals)
-    
-    predicted_revenue = predict(len(x))
-    good_month_pred = predicted_revenue + std_error
-    bad_month_pred = predicted_revenue - std_error
-    
-    prediction_data = [None] * len(chart_values)
-    prediction_data[-1] = chart_values[-1]
-    prediction_data.append(predicted_revenue)
-    
-    good_month_data = [None] * len(chart_values)
-    good_month_data[-1] = chart_values[-1]
-    good_month_data.append(good_month_pred)
-
-    bad_month_data = [None] * len(chart_values)
-    bad_month_data[-1] = chart_values[-1]
-    bad_month_data.append(bad_month_pred)
-    
-    next_month = get_next_month(chart_labels[-1])
-    chart_labels.append(next_month)
-    # --- End of Prediction ---
-
-    # 4. Pass ALL chart data to charts.html
-    return render_template(
-        "charts.html",
-        # Monthly Revenue Chart
-        chart_labels=json.dumps(chart_labels),
-        chart_data=json.dumps(chart_values),
-        prediction_data=json.dumps(prediction_data),
-        good_month_data=json.dumps(good_month_data),
-        bad_month_data=json.dumps(bad_month_data),
-        
-        # Inventory Chart
-        inventory_chart_data=json.dumps(dashboard_data['inventory_chart_data']),
-        
-        # Donut Chart
-        donut_chart_data=json.dumps(dashboard_data['donut_chart_data']),
-        
-        # --- NEW: Low Stock Alerts ---
-        low_stock_alerts=dashboard_data['low_stock_alerts']
-    )
+    snapshot = get_request_snapshot()
+
+    def get_context():
+        dashboard_data = snapshot['bundle']
+
+        # 2. Get the monthly chart with its prediction range (computed once per snapshot)
+        forecast = get_forecast(snapshot)
+
+        # 3. Pass ALL chart data to charts.html
+        return dict(
+            # Monthly Revenue Chart
+            chart_labels=json.dumps(forecast['chart_labels']),
+            chart_data=json.dumps(forecast['chart_values']),
+            prediction_data=json.dumps(forecast['prediction_data']),
+            good_month_data=json.dumps(forecast['good_month_data']),
+            bad_month_data=json.dumps(forecast['bad_month_data']),
+
+            # Inventory Chart
+            inventory_chart_data=json.dumps(dashboard_data['inventory_chart_data']),
+
+            # Donut Chart
+            donut_chart_data=json.dumps(dashboard_data['donut_chart_data']),
+
+            # --- NEW: Low Stock Alerts ---
+            alerts_dropdown=get_alerts_dropdown(snapshot),
+
+            # Month window picker
+            **get_window_context(snapshot)
+        )
+
+    return render_page(snapshot, "charts.html", get_context, get_page_variant(),
+                       current_app.config["FORECAST_MODEL"], current_app.config["FORECAST_INTERVAL"])
 
 @views.route("/tables")
 def tables():
     # 1. Get all the data from our analysis file
-    dashboard_data = get_dashboard_data()
-
-    # 3. Pass BOTH tables to tables.html
-    return render_template(
-        "tables.html",
-        top_items_data=dashboard_data['top_items_json'],
-        inventory_data=dashboard_data['inventory_table_data'],
-        
-        # --- NEW: Low Stock Alerts ---
-        low_stock_alerts=dashboard_data['low_stock_alerts']
-    )
\ No newline at end of file
+    snapshot = get_request_snapshot()
+
+    # 2. Pass the inventory table to tables.html (items are loaded via /api/v1/tables/items)
+    def get_context():
+        dashboard_data = snapshot['bundle']
+        return dict(
+            inventory_data=dashboard_data['inventory_table_data'],
+
+            # --- NEW: Low Stock Alerts ---
+            alerts_dropdown=get_alerts_dropdown(snapshot),
+
+            # Month window picker
+            **get_window_context(snapshot)
+        )
+
+    return render_page(snapshot, "tables.html", get_context, get_page_variant())
+
+@views.route("/status/snapshot")
+def snapshot_status():
+    """Build time/duration of the served snapshot, for alerting on slow or failed rebuilds."""
+    refresher = current_app.extensions.get("snapshot_refresher")
+    if refresher is not None:
+        status = refresher.status()
+    else:
+        snapshot = get_dashboard_snapshot()
+        status = {
+            "running": False,
+            "version": snapshot['version'],
+            "built_at": snapshot['built_at'],
+            "build_seconds": snapshot['build_seconds'],
+        }
+    status["cache"] = get_cache_stats()
+    status["locations"] = get_location_status()
+    status["render_cache"] = get_render_cache_stats()
+    return jsonify(status)
+
+@views.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage and per-route latency histograms, counters and cache hit rates."""
+    return Response(render_metrics(), mimetype=PROMETHEUS_CONTENT_TYPE)